@@ -0,0 +1,52 @@
+###
+#   Sequential generation of photonic graph states from qutrit sources.
+#
+#   The submodules are loaded lazily, on first attribute access, so importing
+#   the package (e.g., in a worker process) does not import Cirq or SciPy.
+#   Modules that only need NumPy, such as gate_matrices and witness_sampling,
+#   can be used without the full stack.
+###
+
+### loading some moduels
+import importlib
+
+##-- the submodules of the package
+_SUBMODULES = (
+    "batch_eval",
+    "checkpoint",
+    "circuit_codec",
+    "emitter_compiler",
+    "fusion",
+    "gate_matrices",
+    "graph_state_gen_circuits",
+    "lightcone",
+    "low_rank",
+    "measurement_groups",
+    "pipeline",
+    "precision",
+    "qutrit_utils",
+    "reachable",
+    "sensitivity",
+    "service",
+    "sharded",
+    "stabilizer_sets",
+    "streaming",
+    "target_graphs",
+    "transfer_matrix",
+    "witness_sampling",
+)
+
+__all__ = list(_SUBMODULES)
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module("." + name, __name__)
+        globals()[name] = module
+        return module
+    #
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+#
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
+#
@@ -0,0 +1,242 @@
+###
+#   This module evaluates expectation values over a series of stored density
+#   matrices (e.g., every size of a topology, or every point of a parameter
+#   sweep) with the disk and the CPU working at the same time, instead of the
+#   load, compute, write loop of test_witness_on_dms.ipynb and
+#   evalue_all_stabilizers.ipynb.
+#
+#   The upcoming states are read by a small thread pool into a bounded buffer
+#   (at most `buffer` states are loaded or in flight ahead of the one being
+#   evaluated, so memory stays bounded for large registers), the current
+#   state is evaluated on the calling thread (NumPy uses the cores for the
+#   contractions) and the results are handed to a background writer thread,
+#   through a bounded queue, that writes each one as a columnar .npz file
+#   (one array per column, e.g., tag and value).
+###
+
+### loading some moduels
+import collections
+import os
+import pickle
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from . import stabilizer_sets
+from . import witness_sampling
+
+###
+#   Loading
+###
+##-- read a density matrix from a .npy, .npz or qutip .qu file
+def load_state(path):
+    """
+    Returns the density matrix stored in path as an array: a .npy file (e.g.,
+    the rho.npy of pipeline.py), the array "rho" (or the only array) of a
+    .npz file, or a Qobj saved with qutip's qsave (unpickling it needs
+    qutip installed).
+
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == ".npy":
+        return np.load(path)
+    #
+    if ext == ".npz":
+        with np.load(path) as data:
+            key = "rho" if "rho" in data.files else data.files[0]
+            return data[key]
+        #
+    #
+    with open(path, "rb") as ff:
+        obj = pickle.load(ff)
+    #
+    return np.asarray(obj.full() if hasattr(obj, "full") else obj)
+#
+
+##-- load the states of a series ahead of their use
+def prefetch(paths, loader=load_state, workers=2, buffer=2):
+    """
+    Yields (index, path, state) for every path, in order, while a pool of
+    workers threads reads the following states; at most buffer states are
+    loaded or being loaded ahead of the one yielded.
+
+    """
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        nxt = 0
+        for ii in range(len(paths)):
+            while nxt < len(paths) and len(pending) <= buffer:
+                pending.append(pool.submit(loader, paths[nxt]))
+                nxt += 1
+            #
+            yield ii, paths[ii], pending.popleft().result()
+        #
+    #
+#
+
+###
+#   Writing
+###
+##-- write a table of columns atomically as an .npz file
+def save_columns(path, columns):
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **{key: np.asarray(value) for key, value in columns.items()})
+    os.replace(tmp, path)
+#
+
+##-- read back a table written by save_columns
+def load_columns(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+    #
+#
+
+##-- background writer of columnar result files
+class ColumnarWriter:
+    """
+    Writes tables of columns ({name: array}) as .npz files on a background
+    thread. write returns as soon as the table is queued; it only blocks
+    when maxsize tables are already waiting. An error of the writer thread
+    is raised by the next write or by close.
+
+    """
+    def __init__(self, maxsize=4):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self.wait_time = 0.0
+        self.write_time = 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    #
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            #
+            if self._error is None:
+                start = time.perf_counter()
+                try:
+                    save_columns(*item)
+                except Exception as err:
+                    self._error = err
+                #
+                self.write_time += time.perf_counter() - start
+            #
+        #
+    #
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+        #
+    #
+
+    def write(self, path, columns):
+        self._check()
+        start = time.perf_counter()
+        self._queue.put((path, columns))
+        self.wait_time += time.perf_counter() - start
+    #
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        #
+        self._check()
+    #
+
+    def __enter__(self):
+        return self
+    #
+
+    def __exit__(self, *exc):
+        self.close()
+    #
+#
+
+###
+#   Evaluators
+###
+##-- node generators, edge products and witness of a graph state
+def witness_columns(rho, graph, witness=witness_sampling.toth_guhne_witness):
+    """
+    Returns the columns node_tag, node_value, edge_tag, edge_value and witness
+    of the register state rho, with the tags of test_witness_on_dms.ipynb
+    (see witness_sampling.witness_result).
+
+    """
+    nodes = witness_sampling.node_pauli_strings(graph)
+    edges = witness_sampling.edge_pauli_strings(graph)
+    result = witness_sampling.witness_result(nodes, edges, witness_sampling.expectation_values(rho, nodes),
+                                             witness_sampling.expectation_values(rho, edges), witness)
+    return {
+        "node_tag": result["nodes"]["tag"],
+        "node_value": result["nodes"]["value"],
+        "edge_tag": result["edges"]["tag"],
+        "edge_value": result["edges"]["value"],
+        "witness": result["witness"],
+    }
+#
+
+##-- every operator of a loaded stabilizer set
+def stabilizer_columns(rho, stabs):
+    """
+    Returns the columns tag (the Pauli strings, 1 for the identity as in the
+    names files), sign and value (signed) of the operators of a set loaded
+    with stabilizer_sets.load on the register state rho.
+
+    """
+    xx, zz = stabilizer_sets.stabilizer_bits(stabs)
+    return {
+        "tag": stabilizer_sets.paulis_to_strings(xx, zz, identity="1"),
+        "sign": stabilizer_sets.stabilizer_signs(stabs),
+        "value": stabilizer_sets.stabilizer_expectation_values(rho, stabs),
+    }
+#
+
+###
+#   Series
+###
+##-- evaluate every state of a series, overlapping loading, compute and writing
+def evaluate_series(paths, evaluate, out_paths, loader=load_state, load_workers=2, buffer=2, write_queue=4):
+    """
+    Loads the state of every path (see prefetch), evaluates it with
+    evaluate(state, index), which returns a table of columns, and writes the
+    table to the matching out path (see ColumnarWriter). Returns a report
+    with the number of states and the time spent waiting for loads,
+    computing, waiting for the writer and writing (the last one overlaps with
+    the others).
+
+    e.g., evaluate_series(rho_paths, lambda rho, ii: witness_columns(rho, graphs[ii]), out_paths)
+
+    """
+    report = {"states": 0, "load_wait": 0.0, "compute_time": 0.0, "write_wait": 0.0, "write_time": 0.0}
+    with ColumnarWriter(write_queue) as writer:
+        states = prefetch(paths, loader, load_workers, buffer)
+        while True:
+            start = time.perf_counter()
+            item = next(states, None)
+            report["load_wait"] += time.perf_counter() - start
+            if item is None:
+                break
+            #
+            ii, _, rho = item
+            start = time.perf_counter()
+            columns = evaluate(rho, ii)
+            report["compute_time"] += time.perf_counter() - start
+            writer.write(out_paths[ii], columns)
+            report["states"] += 1
+            del rho
+        #
+    #
+    report["write_wait"] = writer.wait_time
+    report["write_time"] = writer.write_time
+    return report
+#
@@ -0,0 +1,131 @@
+###
+#   This module runs the density-matrix simulation of a generation circuit
+#   with periodic checkpoints, so a long run that is interrupted or pre-empted
+#   resumes from its last checkpoint instead of from the start.
+#
+#   A checkpoint folder holds the density matrix after some moment, written
+#   to a memory-mapped .npy file, and a json file with the moment index, the
+#   state of the random number generator of the simulator, the precision and
+#   a fingerprint of the circuit (the sha1 of its circuit_codec encoding), so
+#   a checkpoint is never resumed with a different circuit. The json file is
+#   replaced atomically after its state file is written, so it always points
+#   to a complete state.
+###
+
+### loading some moduels
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import cirq
+
+from . import circuit_codec
+from . import qutrit_utils
+
+META_FILE = "checkpoint.json"
+
+###
+#   Checkpoint files
+###
+##-- fingerprint of a circuit, independent of how it was built
+def circuit_fingerprint(circuit):
+    return hashlib.sha1(circuit_codec.encode(circuit)).hexdigest()
+#
+
+##-- the metadata of the last checkpoint in a folder, or None
+def load_checkpoint(ckpt_dir):
+    path = os.path.join(ckpt_dir, META_FILE)
+    if not os.path.exists(path):
+        return None
+    #
+    with open(path) as ff:
+        return json.load(ff)
+    #
+#
+
+##-- write the state after a moment and point the metadata to it
+def save_checkpoint(ckpt_dir, rho, moment, rng, fingerprint, precision):
+    os.makedirs(ckpt_dir, exist_ok=True)
+    previous = load_checkpoint(ckpt_dir)
+
+    state_file = "state_%06d.npy" % moment
+    state = np.lib.format.open_memmap(os.path.join(ckpt_dir, state_file), mode="w+", dtype=rho.dtype, shape=rho.shape)
+    state[...] = rho
+    state.flush()
+    del state
+
+    name, keys, pos, has_gauss, cached_gaussian = rng.get_state()
+    meta = {
+        "moment": moment,
+        "state_file": state_file,
+        "fingerprint": fingerprint,
+        "precision": precision,
+        "rng_state": [name, keys.tolist(), int(pos), int(has_gauss), float(cached_gaussian)],
+        "time": time.time(),
+    }
+    tmp = os.path.join(ckpt_dir, META_FILE + ".tmp")
+    with open(tmp, "w") as ff:
+        json.dump(meta, ff)
+    #
+    os.replace(tmp, os.path.join(ckpt_dir, META_FILE))
+
+    if previous is not None and previous["state_file"] != state_file:
+        os.remove(os.path.join(ckpt_dir, previous["state_file"]))
+    #
+#
+
+###
+#   Simulation
+###
+##-- simulate a circuit, checkpointing and resuming from ckpt_dir
+def simulate_with_checkpoints(circuit, ckpt_dir, every_moments=None, every_seconds=300.0,
+                              precision="double", seed=None, save_final=True):
+    """
+    Returns the final density matrix of the circuit and the qid shape of the
+    register, as precision.simulate_density_matrix, writing a checkpoint into
+    ckpt_dir every every_moments moments and/or every every_seconds seconds,
+    and at the end of the circuit (unless save_final is False, e.g., when the
+    caller keeps the result and drops the folder). If ckpt_dir already holds
+    a checkpoint of the same circuit, the simulation resumes from it.
+
+    """
+    qubits = sorted(circuit.all_qubits())
+    qid_shape = cirq.qid_shape(qubits)
+    fingerprint = circuit_fingerprint(circuit)
+    rng = np.random.RandomState(seed)
+
+    start = 0
+    initial_state = 0
+    meta = load_checkpoint(ckpt_dir)
+    if meta is not None:
+        if meta["fingerprint"] != fingerprint or meta["precision"] != precision:
+            raise ValueError("the checkpoint in %s belongs to a different circuit or precision" % ckpt_dir)
+        #
+        start = meta["moment"]
+        initial_state = np.array(np.load(os.path.join(ckpt_dir, meta["state_file"]), mmap_mode="r"))
+        name, keys, pos, has_gauss, cached_gaussian = meta["rng_state"]
+        rng.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+        if start == len(circuit):
+            return initial_state, qid_shape
+        #
+    #
+
+    dsim = cirq.DensityMatrixSimulator(dtype=qutrit_utils.PRECISIONS[precision], seed=rng)
+    last_save = time.monotonic()
+    moment = start
+    rho = initial_state
+    for step in dsim.simulate_moment_steps(circuit[start:], qubit_order=qubits, initial_state=initial_state):
+        moment += 1
+        rho = step.density_matrix(copy=False)
+        due = every_moments is not None and (moment - start) % every_moments == 0
+        due = due or (every_seconds is not None and time.monotonic() - last_save >= every_seconds)
+        if (due and moment < len(circuit)) or (save_final and moment == len(circuit)):
+            save_checkpoint(ckpt_dir, rho, moment, rng, fingerprint, precision)
+            last_save = time.monotonic()
+        #
+    #
+    return np.array(rho), qid_shape
+#
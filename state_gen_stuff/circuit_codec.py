@@ -0,0 +1,261 @@
+###
+#   This module is a compact binary format for the circuits built with
+#   graph_state_gen_circuits.py: an array of opcodes with the moment, qid
+#   indices and offset into a pool of float parameters of each operation.
+#
+#   File layout: the magic bytes, the length of a json header (qids, number
+#   of operations and parameters, precision), the header, the operation
+#   records and the parameter pool, each section aligned to 8 bytes so the
+#   records and the parameters can be memory mapped.
+###
+
+### loading some moduels
+import json
+import struct
+
+import numpy as np
+
+from . import gate_matrices
+
+###
+#   Format
+###
+MAGIC = b"Q3CIRC01"
+
+##-- the opcode, number of qids and parameter names of each gate and channel;
+##-- the fused superoperator channels store their flattened superoperator;
+##-- the Cirq eigengates are the single-qubit gates applied to the photons
+OPCODES = {
+    "Q3_H": (0, 1, ("angle",)),
+    "Q3_PI_ef": (1, 1, ("angle",)),
+    "Q3_CNOT": (2, 2, ("leakage_rate", "leakage_phase")),
+    "Q3_SWAP": (3, 2, ()),
+    "Q3_CZ": (4, 2, ("angle", "leakage_rate", "leakage_phase")),
+    "Q3_AmplitudeDampingChannel": (5, 1, ("pro1", "pro2")),
+    "Q3_PhaseDampingChannel": (6, 1, ("pro1", "pro2")),
+    "Q3_SuperoperatorChannel": (7, 1, None),
+    "Q3_S": (8, 1, ("angle",)),
+    "HPowGate": (9, 1, ("exponent", "global_shift")),
+    "XPowGate": (10, 1, ("exponent", "global_shift")),
+    "ZPowGate": (11, 1, ("exponent", "global_shift")),
+}
+_NAMES = {code: name for name, (code, _, _) in OPCODES.items()}
+
+##-- one record per operation
+OP_DTYPE = np.dtype([
+    ("op", "u1"),
+    ("nparams", "u1"),
+    ("moment", "<u4"),
+    ("q0", "<i4"),
+    ("q1", "<i4"),
+    ("poff", "<u4"),
+])
+
+##-- the opcode name of a gate, looked up along its classes, so e.g. cirq.X (a
+##-- _PauliX) and cirq.rx (an Rx) are encoded as the XPowGate they derive from
+def gate_name(gate):
+    for cls in type(gate).__mro__:
+        if cls.__name__ in OPCODES:
+            return cls.__name__
+        #
+    #
+    return None
+#
+
+##-- the float parameters of a gate
+def gate_params(gate):
+    name = gate_name(gate)
+    if OPCODES[name][2] is None:
+        return gate_matrices.superoperator_params(gate.superoperator).tolist()
+    #
+    return [float(getattr(gate, nn)) for nn in OPCODES[name][2]]
+#
+
+##-- pad a section to a multiple of 8 bytes
+def _pad(nbytes):
+    return (-nbytes) % 8
+#
+
+###
+#   Encoding
+###
+##-- turn a circuit into its operation records and parameter pool
+def circuit_to_arrays(circuit):
+    """
+    Returns the qid table (a list of (index, dimension) tuples), the array of
+    operation records and the float64 parameter pool of a circuit made of the
+    gates and channels of qutrit_utils (and the Cirq H, X and Z power gates
+    on the photons, including cirq.H, cirq.X, cirq.Z, cirq.rx and cirq.rz,
+    stored by their exponent and global shift).
+
+    """
+    qids = sorted(circuit.all_qubits())
+    qid_table = []
+    for qq in qids:
+        if not hasattr(qq, "x"):
+            raise ValueError("only line qids can be encoded, got %r" % (qq,))
+        #
+        qid_table.append((int(qq.x), int(qq.dimension)))
+    #
+    index = {qq: ii for ii, qq in enumerate(qids)}
+
+    records = []
+    params = []
+    for mm, moment in enumerate(circuit):
+        for op in moment:
+            name = gate_name(op.gate)
+            if name is None:
+                raise ValueError("cannot encode the operation %r" % (op,))
+            #
+            values = gate_params(op.gate)
+            qs = [index[qq] for qq in op.qubits] + [-1]
+            records.append((OPCODES[name][0], len(values), mm, qs[0], qs[1], len(params)))
+            params.extend(values)
+        #
+    #
+    return qid_table, np.array(records, dtype=OP_DTYPE), np.array(params, dtype=np.float64)
+#
+
+##-- precision of the gates of a circuit
+def _circuit_precision(circuit):
+    for op in circuit.all_operations():
+        if np.dtype(getattr(op.gate, "dtype", np.complex128)) == np.complex64:
+            return "single"
+        #
+    #
+    return "double"
+#
+
+##-- encode a circuit into bytes
+def encode(circuit):
+    qid_table, records, params = circuit_to_arrays(circuit)
+    header = json.dumps({
+        "qids": qid_table,
+        "n_ops": len(records),
+        "n_params": len(params),
+        "precision": _circuit_precision(circuit),
+    }).encode()
+    header += b" "*_pad(len(MAGIC) + 4 + len(header))
+
+    ops_bytes = records.tobytes()
+    return b"".join([
+        MAGIC, struct.pack("<I", len(header)), header,
+        ops_bytes, b"\0"*_pad(len(ops_bytes)),
+        params.tobytes(),
+    ])
+#
+
+##-- write an encoded circuit to a file
+def save(path, circuit):
+    with open(path, "wb") as ff:
+        ff.write(encode(circuit))
+    #
+#
+
+###
+#   Decoding
+###
+##-- read the header and the arrays of an encoded circuit
+def _read(buffer, path=None):
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("not an encoded Q3 circuit")
+    #
+    (hlen,) = struct.unpack("<I", bytes(buffer[len(MAGIC):len(MAGIC) + 4]))
+    start = len(MAGIC) + 4
+    header = json.loads(bytes(buffer[start:start + hlen]).decode())
+
+    ops_offset = start + hlen
+    ops_nbytes = header["n_ops"]*OP_DTYPE.itemsize
+    params_offset = ops_offset + ops_nbytes + _pad(ops_nbytes)
+
+    if path is None:
+        records = np.frombuffer(buffer, dtype=OP_DTYPE, count=header["n_ops"], offset=ops_offset)
+        params = np.frombuffer(buffer, dtype=np.float64, count=header["n_params"], offset=params_offset)
+    else:
+        records = np.memmap(path, dtype=OP_DTYPE, mode="r", offset=ops_offset, shape=(header["n_ops"],))
+        params = np.memmap(path, dtype=np.float64, mode="r", offset=params_offset, shape=(header["n_params"],))
+    #
+    return header, records, params
+#
+
+##-- memory map the arrays of an encoded circuit file, without Cirq
+def load_arrays(path):
+    """
+    Returns the header, the operation records and the parameter pool of an
+    encoded circuit file; the arrays are memory mapped. Together with
+    op_matrices this lets worker processes run the circuit with NumPy only.
+
+    """
+    return _read(np.memmap(path, dtype=np.uint8, mode="r"), path)
+#
+
+##-- the gate name and parameters of an operation record
+def op_params(record, params):
+    name = _NAMES[int(record["op"])]
+    off = int(record["poff"])
+    return name, tuple(float(pp) for pp in params[off:off + int(record["nparams"])])
+#
+
+##-- the unitary or the stack of Kraus operators of an operation record
+def op_matrices(record, params, dtype=np.complex128, table=None):
+    """
+    Returns the matrix of the operation, taken from table (a gate table of
+    gate_matrices, e.g., from circuit_gate_table or load_gate_table) when it
+    holds the gate, and computed otherwise.
+
+    """
+    name, values = op_params(record, params)
+    key = gate_matrices.table_key(name, values)
+    if table is not None and key in table:
+        return np.asarray(table[key], dtype=dtype)
+    #
+    return gate_matrices.GATE_MATRICES[name](*values, dtype = dtype)
+#
+
+##-- the gate table of an encoded circuit, each distinct gate computed once
+def circuit_gate_table(records, params, dtype=np.complex128):
+    """
+    Returns the gate table of the distinct gates of an encoded circuit; the
+    noisy builders repeat the same gates and idle channels at every step, so
+    the table holds only a few entries. It can be shipped to the workers
+    with gate_matrices.save_gate_table.
+
+    """
+    return gate_matrices.gate_table(sorted(set(op_params(record, params) for record in records)), dtype)
+#
+
+##-- rebuild the circuit from its header and arrays
+def arrays_to_circuit(header, records, params):
+    # Cirq is only needed to rebuild the circuit
+    import cirq
+    from . import qutrit_utils
+
+    qids = [cirq.LineQubit(xx) if dim == 2 else cirq.LineQid(xx, dimension=dim) for xx, dim in header["qids"]]
+    gate_classes = {name: getattr(qutrit_utils, name, None) or getattr(cirq, name) for name in OPCODES}
+
+    moments = [[] for _ in range(int(records["moment"].max()) + 1 if len(records) else 0)]
+    with qutrit_utils.precision_mode(header["precision"]):
+        for record in records:
+            name, values = op_params(record, params)
+            nqids = OPCODES[name][1]
+            targets = [qids[int(record["q0"])], qids[int(record["q1"])]][:nqids]
+            if OPCODES[name][2] is None:
+                gate = gate_classes[name](gate_matrices.superoperator_from_params(*values))
+            else:
+                gate = gate_classes[name](**dict(zip(OPCODES[name][2], values)))
+            #
+            moments[int(record["moment"])].append(gate.on(*targets))
+        #
+    #
+    return cirq.Circuit(cirq.Moment(ops) for ops in moments)
+#
+
+##-- decode a circuit from bytes
+def decode(data):
+    return arrays_to_circuit(*_read(memoryview(data)))
+#
+
+##-- load an encoded circuit file, memory mapping its arrays
+def load(path):
+    return arrays_to_circuit(*load_arrays(path))
+#
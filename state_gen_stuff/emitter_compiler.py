@@ -0,0 +1,546 @@
+###
+#   This module compiles the generation circuit of an arbitrary target graph
+#   with the minimum number of qutrit storages (emitters).
+#
+#   For an emission order, the height function h(x) is the entanglement (in
+#   ebits) between the first x photons and the rest of the target graph
+#   state, i.e., the rank over GF(2) of the adjacency matrix between the two
+#   parts (the cut-rank). A protocol that emits the photons in that order
+#   needs max_x h(x) emitters, and that number is enough. The order search
+#   minimizes the maximum height, exactly (over all orders, by dynamic
+#   programming over subsets) for small graphs and greedily for large ones.
+#
+#   The protocol is found in reverse time on a stabilizer tableau: starting
+#   from the graph state and the emitters in |0>, each photon (last emitted
+#   first) is absorbed into |0>, either by a CNOT from an emitter or by a
+#   SWAP with a free emitter, after single-qubit and emitter-emitter Clifford
+#   gates. The generation circuit is the inverse of that sequence, written
+#   with the gates of qutrit_utils on the storages (an emitter CNOT is
+#   H CZ H, an emission is the pi_ef pulse and the CNOT) and the Cirq H, S
+#   and X gates on the photons.
+###
+
+### loading some moduels
+import numpy as np
+
+import cirq
+
+from . import qutrit_utils
+
+###
+#   Height function and emission order
+###
+##-- the rows of the adjacency matrix of a graph as bitmasks
+def adjacency_masks(graph):
+    nodes = sorted(graph.nodes)
+    index = {nn: ii for ii, nn in enumerate(nodes)}
+    masks = [0]*len(nodes)
+    for aa, bb in graph.edges:
+        masks[index[aa]] |= 1 << index[bb]
+        masks[index[bb]] |= 1 << index[aa]
+    #
+    return masks
+#
+
+##-- the GF(2) rank of the adjacency matrix between a set of nodes and the rest
+def cut_rank(masks, subset):
+    basis = []
+    vv = subset
+    while vv:
+        low = vv & -vv
+        row = masks[low.bit_length() - 1] & ~subset
+        for bb in basis:
+            row = min(row, row ^ bb)
+        #
+        if row:
+            basis.append(row)
+        #
+        vv ^= low
+    #
+    return len(basis)
+#
+
+##-- the height function of an emission order
+def height_function(graph, order):
+    """
+    Returns [h(0), .., h(N)], with h(x) the cut-rank of the first x nodes of
+    order (node positions in sorted order) against the rest.
+
+    """
+    masks = adjacency_masks(graph)
+    heights = [0]
+    subset = 0
+    for nn in order:
+        subset |= 1 << nn
+        heights.append(cut_rank(masks, subset))
+    #
+    return heights
+#
+
+##-- the order with the lowest maximum height, over every order
+def _exact_order(masks):
+    nn = len(masks)
+    full = (1 << nn) - 1
+    best = [0]*(full + 1)
+    last = [-1]*(full + 1)
+    for subset in range(1, full + 1):
+        value = None
+        vv = subset
+        while vv:
+            low = vv & -vv
+            if value is None or best[subset ^ low] < value:
+                value = best[subset ^ low]
+                last[subset] = low.bit_length() - 1
+            #
+            vv ^= low
+        #
+        best[subset] = max(value, cut_rank(masks, subset))
+    #
+    order = []
+    subset = full
+    while subset:
+        order.append(last[subset])
+        subset ^= 1 << last[subset]
+    #
+    return order[::-1]
+#
+
+##-- greedy order: add the node that keeps the cut-rank lowest
+def _greedy_order(masks, first):
+    nn = len(masks)
+    order = [first]
+    subset = 1 << first
+    while len(order) < nn:
+        ##-- lowest cut-rank, then fewest edges to the remaining nodes
+        candidates = [ii for ii in range(nn) if not subset >> ii & 1]
+        ii = min(candidates, key=lambda ii: (cut_rank(masks, subset | 1 << ii),
+                                             bin(masks[ii] & ~(subset | 1 << ii)).count("1"), ii))
+        order.append(ii)
+        subset |= 1 << ii
+    #
+    return order
+#
+
+##-- the emission order that needs the fewest emitters
+def min_height_order(graph, exact_limit=14):
+    """
+    Returns an emission order (node positions in sorted order) and its
+    height function. Graphs with at most exact_limit nodes are solved
+    exactly; larger graphs take the best of the sorted order and a greedy
+    order started from every node.
+
+    """
+    masks = adjacency_masks(graph)
+    nn = len(masks)
+    if nn <= exact_limit:
+        order = _exact_order(masks)
+        return order, height_function(graph, order)
+    #
+    orders = [list(range(nn))] + [_greedy_order(masks, first) for first in range(nn)]
+    scored = [(max(hh), sum(hh), order, hh) for order in orders for hh in [height_function(graph, order)]]
+    _, _, order, heights = min(scored, key=lambda ss: ss[:2])
+    return order, heights
+#
+
+###
+#   Stabilizer tableau
+###
+##-- the exponent of i of the product of two Paulis, per qubit (Aaronson-Gottesman)
+def _phase_exponents(x1, z1, x2, z2):
+    x1, z1, x2, z2 = [np.asarray(aa, dtype=np.int64) for aa in (x1, z1, x2, z2)]
+    return np.where(x1 & z1, z2 - x2,
+                    np.where(x1 & (1 - z1), z2*(2*x2 - 1),
+                             np.where((1 - x1) & z1, x2*(1 - 2*z2), 0)))
+#
+
+class StabilizerTableau:
+    """
+    The stabilizer generators of a pure state of n qubits, one row per
+    generator with its X bits, Z bits and sign bit: the generator is (-1)^r
+    times the product of X (x=1, z=0), Z (x=0, z=1) or Y (x=z=1) on each
+    qubit.
+
+    """
+    def __init__(self, x, z, r):
+        self.x = np.array(x, dtype=np.uint8)
+        self.z = np.array(z, dtype=np.uint8)
+        self.r = np.array(r, dtype=np.uint8)
+    #
+
+    ##-- |0..0>
+    @classmethod
+    def zero_state(cls, nqubits):
+        return cls(np.zeros((nqubits, nqubits)), np.eye(nqubits), np.zeros(nqubits))
+    #
+
+    ##-- the graph state on the first qubits and |0> on the others
+    @classmethod
+    def graph_state(cls, graph, nextra=0):
+        masks = adjacency_masks(graph)
+        nn = len(masks)
+        tab = cls.zero_state(nn + nextra)
+        for ii, mask in enumerate(masks):
+            tab.x[ii] = 0
+            tab.z[ii] = 0
+            tab.x[ii, ii] = 1
+            tab.z[ii, :nn] = [mask >> jj & 1 for jj in range(nn)]
+        #
+        return tab
+    #
+
+    @property
+    def nqubits(self):
+        return self.x.shape[1]
+    #
+
+    ##-- the Pauli of a generator on a qubit
+    def pauli(self, row, qubit):
+        return "IZXY"[2*int(self.x[row, qubit]) + int(self.z[row, qubit])]
+    #
+
+    ##-- the qubits a generator acts on, out of some qubits
+    def support(self, row, qubits):
+        return [qq for qq in qubits if self.x[row, qq] or self.z[row, qq]]
+    #
+
+    ##-- Clifford gates (conjugation of the generators)
+    def h(self, qq):
+        self.r ^= self.x[:, qq] & self.z[:, qq]
+        self.x[:, qq], self.z[:, qq] = self.z[:, qq].copy(), self.x[:, qq].copy()
+    #
+
+    def s(self, qq):
+        self.r ^= self.x[:, qq] & self.z[:, qq]
+        self.z[:, qq] ^= self.x[:, qq]
+    #
+
+    def sdg(self, qq):
+        for _ in range(3):
+            self.s(qq)
+        #
+    #
+
+    def pauli_x(self, qq):
+        self.r ^= self.z[:, qq]
+    #
+
+    def cnot(self, cc, tt):
+        self.r ^= self.x[:, cc] & self.z[:, tt] & (self.x[:, tt] ^ self.z[:, cc] ^ 1)
+        self.x[:, tt] ^= self.x[:, cc]
+        self.z[:, cc] ^= self.z[:, tt]
+    #
+
+    def cz(self, aa, bb):
+        self.h(bb)
+        self.cnot(aa, bb)
+        self.h(bb)
+    #
+
+    def swap(self, aa, bb):
+        self.x[:, [aa, bb]] = self.x[:, [bb, aa]]
+        self.z[:, [aa, bb]] = self.z[:, [bb, aa]]
+    #
+
+    ##-- multiply generator i into generator h
+    def rowsum(self, hh, ii):
+        exponent = 2*int(self.r[hh]) + 2*int(self.r[ii])
+        exponent += int(_phase_exponents(self.x[ii], self.z[ii], self.x[hh], self.z[hh]).sum())
+        self.r[hh] = (exponent % 4) // 2
+        self.x[hh] ^= self.x[ii]
+        self.z[hh] ^= self.z[ii]
+    #
+
+    ##-- row-reduce on some qubits
+    def echelon(self, qubits, nrows=None):
+        """
+        Multiplies and reorders the generators so the rows from the returned
+        index on act trivially on the given qubits, i.e., they generate the
+        stabilizers supported on the other qubits. Only the first nrows rows
+        are used as pivots (the others are only reduced).
+
+        """
+        nrows = len(self.r) if nrows is None else nrows
+        kk = 0
+        for qq in qubits:
+            for bits in (self.x, self.z):
+                pivots = [ii for ii in range(kk, nrows) if bits[ii, qq]]
+                if not pivots:
+                    continue
+                #
+                for arr in (self.x, self.z, self.r):
+                    arr[[kk, pivots[0]]] = arr[[pivots[0], kk]]
+                #
+                for ii in range(len(self.r)):
+                    if ii != kk and bits[ii, qq]:
+                        self.rowsum(ii, kk)
+                    #
+                #
+                kk += 1
+            #
+        #
+        return kk
+    #
+
+    ##-- whether a Pauli operator, with its sign, stabilizes the state
+    def stabilizes(self, pauli, sign=1):
+        """
+        pauli is a {qubit: "X"|"Y"|"Z"} dictionary. The Pauli is reduced with
+        the generators; it is in the stabilizer group if nothing is left, and
+        the sign bit left is that of the product of the generators.
+
+        """
+        px = np.zeros(self.nqubits, dtype=np.uint8)
+        pz = np.zeros(self.nqubits, dtype=np.uint8)
+        for qq, pp in pauli.items():
+            px[qq] = pp in "XY"
+            pz[qq] = pp in "YZ"
+        #
+        nn = len(self.r)
+        tab = StabilizerTableau(np.vstack([self.x, px]), np.vstack([self.z, pz]), np.append(self.r, 0 if sign > 0 else 1))
+        tab.echelon(range(self.nqubits), nrows=nn)
+        return not (tab.x[nn].any() or tab.z[nn].any()) and tab.r[nn] == 0
+    #
+#
+
+###
+#   Protocol
+###
+##-- the inverse of each Clifford of the protocol
+_INVERSE = {"S": "SDG", "SDG": "S"}
+
+class _ReverseProtocol:
+    """
+    The reverse-time protocol of a graph state: the gates applied to the
+    tableau of the graph state (photons 0..N-1) and the emitters (N..N+ne-1),
+    in the order they are applied.
+
+    """
+    def __init__(self, graph, nemitters):
+        self.tab = StabilizerTableau.graph_state(graph, nemitters)
+        self.nphotons = len(graph)
+        self.emitters = list(range(self.nphotons, self.nphotons + nemitters))
+        self.ops = []
+    #
+
+    def apply(self, name, *qubits):
+        {"H": self.tab.h, "S": self.tab.s, "SDG": self.tab.sdg, "X": self.tab.pauli_x,
+         "CNOT": self.tab.cnot, "SWAP": self.tab.swap}[name](*qubits)
+        self.ops.append((name,) + qubits)
+    #
+
+    ##-- turn the Pauli of a generator on a qubit into Z
+    def to_z(self, row, qq):
+        pp = self.tab.pauli(row, qq)
+        if pp == "Y":
+            self.apply("SDG", qq)
+        #
+        if pp in "XY":
+            self.apply("H", qq)
+        #
+    #
+
+    ##-- turn the part of a generator on some emitters into +Z on one of them
+    def to_single_z(self, row, emitters):
+        for ee in emitters:
+            self.to_z(row, ee)
+        #
+        target = emitters[0]
+        for ee in emitters[1:]:
+            self.apply("CNOT", ee, target)
+        #
+        if self.tab.r[row]:
+            self.apply("X", target)
+        #
+        return target
+    #
+
+    ##-- bring photon j to |0>, decoupled from the rest
+    def absorb(self, photon):
+        tab = self.tab
+        others = [pp for pp in range(self.nphotons) if pp != photon]
+        kk = tab.echelon(others)
+        rows = [ii for ii in range(kk, len(tab.r)) if tab.x[ii, photon] or tab.z[ii, photon]]
+        if rows:
+            ##-- a stabilizer P_j E: local gates, then a CNOT from an emitter
+            row = rows[0]
+            self.to_z(row, photon)
+            support = tab.support(row, self.emitters)
+            if support:
+                emitter = self.to_single_z(row, support)
+                self.apply("CNOT", emitter, photon)
+            elif tab.r[row]:
+                self.apply("X", photon)
+            #
+            return
+        #
+        ##-- no such stabilizer: swap the photon with a free emitter
+        kk = tab.echelon(range(self.nphotons))
+        if kk == len(tab.r):
+            raise ValueError("no free emitter to absorb photon %d" % photon)
+        #
+        emitter = self.to_single_z(kk, tab.support(kk, self.emitters))
+        self.apply("SWAP", emitter, photon)
+    #
+
+    ##-- bring the emitters back to |0..0>
+    def reset_emitters(self):
+        done = []
+        for _ in self.emitters:
+            kk = self.tab.echelon(list(range(self.nphotons)) + done)
+            free = [ee for ee in self.emitters if ee not in done]
+            done.append(self.to_single_z(kk, self.tab.support(kk, free)))
+        #
+    #
+#
+
+##-- the emission protocol of a graph state with the fewest emitters
+def compile_graph(graph, order=None, exact_limit=14):
+    """
+    Returns a dictionary with the emission order (node positions in sorted
+    order, first emitted first), its height function, the number of emitters
+    and the protocol, a list of operations in time order on the photons
+    (0..N-1, node k is the k-th node in sorted order) and the emitters
+    (N..N+ne-1):
+
+        ("H", q), ("S", q), ("SDG", q), ("X", q)   single-qubit Cliffords
+        ("CNOT", e1, e2)                           CNOT between emitters
+        ("EMIT", e, p)                             CNOT from an emitter to a photon in |0>
+        ("SWAP", e, p)                             swap of an emitter and a photon in |0>
+
+    Starting from every qubit in |0>, the protocol prepares the graph state
+    on the photons and leaves the emitters in |0>. With order=None the
+    order is chosen by min_height_order.
+
+    """
+    if order is None:
+        order, heights = min_height_order(graph, exact_limit)
+    else:
+        heights = height_function(graph, order)
+    #
+    nemitters = max(heights)
+    nphotons = len(graph)
+
+    reverse = _ReverseProtocol(graph, nemitters)
+    for photon in order[::-1]:
+        reverse.absorb(photon)
+    #
+    reverse.reset_emitters()
+
+    protocol = []
+    for name, *qubits in reverse.ops[::-1]:
+        if name == "CNOT" and qubits[1] < nphotons:
+            name = "EMIT"
+        #
+        protocol.append((_INVERSE.get(name, name),) + tuple(qubits))
+    #
+    return {
+        "order": list(order),
+        "heights": heights,
+        "nemitters": nemitters,
+        "nphotons": nphotons,
+        "protocol": protocol,
+    }
+#
+
+##-- run a protocol on the tableau of |0..0>
+def run_protocol(compiled):
+    tab = StabilizerTableau.zero_state(compiled["nphotons"] + compiled["nemitters"])
+    gates = {"H": tab.h, "S": tab.s, "SDG": tab.sdg, "X": tab.pauli_x,
+             "CNOT": tab.cnot, "EMIT": tab.cnot, "SWAP": tab.swap}
+    for name, *qubits in compiled["protocol"]:
+        gates[name](*qubits)
+    #
+    return tab
+#
+
+##-- check with the tableau that a protocol prepares the graph state
+def verify_protocol(compiled, graph):
+    """
+    Returns True if every node generator X_n Z_N(n) of graph and the Z of
+    every emitter stabilize the state prepared by the protocol.
+
+    """
+    tab = run_protocol(compiled)
+    nphotons = compiled["nphotons"]
+    for ii, mask in enumerate(adjacency_masks(graph)):
+        pauli = {jj: "Z" for jj in range(nphotons) if mask >> jj & 1}
+        pauli[ii] = "X"
+        if not tab.stabilizes(pauli):
+            return False
+        #
+    #
+    return all(tab.stabilizes({ee: "Z"}) for ee in range(nphotons, nphotons + compiled["nemitters"]))
+#
+
+###
+#   Circuits
+###
+##-- the circuit of a compiled protocol with the qutrit gates
+def protocol_circuit(compiled, noise_params=(0.0, 0.0, 0.0, 0.0), gate_times=None, coherence_times=None):
+    """
+    Returns the circuit of the protocol on the storages LineQid(0..ne-1) and
+    the photons LineQubit(ne..ne+N-1), so node k is the k-th photon in sorted
+    order as in the builders of graph_state_gen_circuits.py.
+
+    noise_params is (gamma, l1_cz, l1_cnot, sq_gamma) as in the ladder
+    builders. With gate_times, a dictionary with the duration of the "H",
+    "S", "X", "CZ", "EMIT" and "SWAP" operations of the storages, and
+    coherence_times, one (T1_e, T2_e, T1_f, T2_f) tuple per storage, every
+    storage idles during each storage operation; the photon gates take no
+    time.
+
+    """
+    gamma, l1_cz, l1_cnot, sq_gamma = noise_params
+    nphotons = compiled["nphotons"]
+    storages = cirq.LineQid.range(compiled["nemitters"], dimension=3)
+    photons = cirq.LineQubit.range(len(storages), len(storages) + nphotons)
+    qid = lambda qq: photons[qq] if qq < nphotons else storages[qq - nphotons]
+
+    circuit = cirq.Circuit()
+
+    def idle(kind):
+        if gate_times is not None:
+            for ss, ct in zip(storages, coherence_times):
+                qutrit_utils.Q3_idle_time(gate_times[kind], ct, ss, circuit)
+            #
+        #
+    #
+
+    for name, *qubits in compiled["protocol"]:
+        qq = qid(qubits[0])
+        if len(qubits) == 1 and qubits[0] < nphotons:
+            circuit.append({"H": cirq.H, "S": cirq.S, "SDG": cirq.S**-1, "X": cirq.X}[name].on(qq))
+        elif name == "H":
+            circuit.append(qutrit_utils.Q3_H(np.pi - sq_gamma).on(qq))
+            idle("H")
+        elif name in ("S", "SDG"):
+            circuit.append(qutrit_utils.Q3_S(np.pi/2 if name == "S" else -np.pi/2).on(qq))
+            idle("S")
+        elif name == "X":
+            circuit.append(qutrit_utils.Q3_H(np.pi - sq_gamma).on(qq))
+            circuit.append(qutrit_utils.Q3_S(np.pi).on(qq))
+            circuit.append(qutrit_utils.Q3_H(np.pi - sq_gamma).on(qq))
+            idle("X")
+        elif name == "CNOT":
+            target = qid(qubits[1])
+            circuit.append(qutrit_utils.Q3_H(np.pi - sq_gamma).on(target))
+            circuit.append(qutrit_utils.Q3_CZ(np.pi - gamma, l1_cz, 0.0).on(qq, target))
+            circuit.append(qutrit_utils.Q3_H(np.pi - sq_gamma).on(target))
+            idle("CZ")
+        elif name == "EMIT":
+            circuit.append(qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(qq))
+            circuit.append(qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(qq, qid(qubits[1])))
+            idle("EMIT")
+        elif name == "SWAP":
+            circuit.append(qutrit_utils.Q3_SWAP().on(qq, qid(qubits[1])))
+            idle("SWAP")
+        #
+    #
+    return circuit
+#
+
+##-- compile a graph straight to its generation circuit
+def compile_circuit(graph, noise_params=(0.0, 0.0, 0.0, 0.0), gate_times=None, coherence_times=None, order=None):
+    compiled = compile_graph(graph, order)
+    return protocol_circuit(compiled, noise_params, gate_times, coherence_times), compiled
+#
@@ -0,0 +1,123 @@
+###
+#   This module is an optimization pass over the circuits built with
+#   graph_state_gen_circuits.py. Every maximal run of single-qutrit gates and
+#   channels on a storage (idle damping, hadamards, pi pulses, ...) between two
+#   multi-qid operations is fused into a single superoperator channel, so the
+#   simulator makes one pass over the density matrix instead of one per
+#   operation (or one per Kraus operator).
+###
+
+### loading some moduels
+import numpy as np
+
+import cirq
+
+from . import gate_matrices
+from . import qutrit_utils
+
+###
+#   Fusion pass
+###
+##-- superoperator of a single-qid operation
+def op_superoperator(op):
+    if cirq.has_unitary(op):
+        return gate_matrices.superoperator(cirq.unitary(op))
+    #
+    return gate_matrices.superoperator(np.array(cirq.kraus(op)))
+#
+
+##-- number of passes over the density matrix the simulator makes for an operation
+def op_passes(op):
+    if isinstance(op.gate, qutrit_utils.Q3_SuperoperatorChannel) or cirq.has_unitary(op):
+        return 1
+    #
+    return len(cirq.kraus(op))
+#
+
+##-- check a fused channel against the run of operations it replaces
+def _verify_run(run, fused, atol):
+    """
+    Compares, as linear maps, the product of the superoperators of the run
+    with the superoperator of the fused channel and with the one of its
+    Kraus operators (the ones the simulator applies).
+
+    """
+    expected = np.eye(fused.dimension**2, dtype=complex)
+    for op in run:
+        expected = op_superoperator(op) @ expected
+    #
+    for got in (fused.superoperator, gate_matrices.superoperator(np.array(cirq.kraus(fused)))):
+        if not np.allclose(got, expected, atol=atol):
+            raise ValueError("fused channel on %s is not equivalent to its run" % (run[0].qubits,))
+        #
+    #
+#
+
+##-- fuse the runs of single-qutrit operations of a circuit
+def fuse_single_qutrit_runs(circuit, verify=True, atol=1e-10):
+    """
+    Returns the circuit where every maximal run (of two or more) single-qid
+    operations on a qid of dimension 3 is replaced by one
+    Q3_SuperoperatorChannel, with the precision of the run, and a report.
+    With verify, each fused channel is checked against the run it replaces.
+
+    The report is a dictionary with the number of fused runs, the number of
+    operations before and after the pass, and the number of full-state passes
+    (one per unitary, one per Kraus operator) before and after the pass.
+
+    """
+    fused_circuit = cirq.Circuit()
+    pending = {}
+    report = {"runs_fused": 0, "ops_before": 0, "ops_after": 0, "passes_before": 0, "passes_after": 0}
+
+    def flush(qid):
+        run = pending.pop(qid, [])
+        if len(run) == 1:
+            fused_circuit.append(run[0])
+            report["passes_after"] += op_passes(run[0])
+        elif len(run) > 1:
+            superop = np.eye(9, dtype=complex)
+            for op in run:
+                superop = op_superoperator(op) @ superop
+            #
+            dtype = np.result_type(*[getattr(op.gate, "dtype", np.complex128) for op in run])
+            fused = qutrit_utils.Q3_SuperoperatorChannel(superop, dtype)
+            if verify:
+                _verify_run(run, fused, atol)
+            #
+            fused_circuit.append(fused.on(qid))
+            report["runs_fused"] += 1
+            report["passes_after"] += 1
+        #
+    #
+
+    for op in circuit.all_operations():
+        report["ops_before"] += 1
+        report["passes_before"] += op_passes(op)
+        if len(op.qubits) == 1 and op.qubits[0].dimension == 3:
+            pending.setdefault(op.qubits[0], []).append(op)
+        else:
+            for qq in op.qubits:
+                flush(qq)
+            #
+            fused_circuit.append(op)
+            report["passes_after"] += op_passes(op)
+        #
+    #
+    for qq in sorted(pending):
+        flush(qq)
+    #
+
+    report["ops_after"] = len(list(fused_circuit.all_operations()))
+    report["passes_removed"] = report["passes_before"] - report["passes_after"]
+    return fused_circuit, report
+#
+
+##-- compare the final density matrices of two circuits (for small registers)
+def verify_equivalence(circuit, fused_circuit, atol=1e-8):
+    qubits = sorted(circuit.all_qubits())
+    dsim = cirq.DensityMatrixSimulator(dtype=np.complex128)
+    rho = dsim.simulate(circuit, qubit_order=qubits).final_density_matrix
+    rho_fused = dsim.simulate(fused_circuit, qubit_order=qubits).final_density_matrix
+    return float(np.max(np.abs(rho - rho_fused))) <= atol
+#
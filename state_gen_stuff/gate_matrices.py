@@ -0,0 +1,267 @@
+###
+#   This module contains the matrices of the qutrit gates and the Kraus
+#   operators of the qutrit channels in qutrit_utils.py. It only depends on
+#   NumPy, so worker processes that only need the matrices do not have to
+#   import Cirq or SciPy.
+###
+
+### loading some moduels
+import numpy as np
+from math import sqrt
+
+###
+#   Numerical precision
+###
+##-- complex dtypes of the gate matrices and Kraus operators
+PRECISIONS = {"double": np.complex128, "single": np.complex64}
+
+###
+#   Gate matrices
+###
+##-- A hadamard for the first two levels of a qutrit
+def h_matrix(angle, dtype=np.complex128):
+    return np.array([[1j*np.cos(0.5*angle) + np.sin(0.5*angle)/np.sqrt(2), np.sin(0.5*angle)/np.sqrt(2), 0],
+                     [np.sin(0.5*angle)/np.sqrt(2), 1j*np.cos(0.5*angle) - np.sin(0.5*angle)/np.sqrt(2), 0],
+                     [0, 0, 1]], dtype = dtype)
+#
+
+##-- A phase on the |e> level of a qutrit (S gate for angle pi/2)
+def s_matrix(angle, dtype=np.complex128):
+    return np.array([[1, 0, 0],
+                     [0, np.exp(1j*angle), 0],
+                     [0, 0, 1]], dtype = dtype)
+#
+
+##-- Pi pulse for the ef transition of the storages
+def pi_ef_matrix(angle, dtype=np.complex128):
+    return np.array([[1, 0, 0],
+                     [0, -1j*np.cos(0.5*angle), np.sin(0.5*angle)],
+                     [0, np.sin(0.5*angle), -1j*np.cos(0.5*angle)]], dtype = dtype)
+#
+
+##-- A CNOT between a qutrit and a qubit, with leakage
+def cnot_matrix(leakage_rate, leakage_phase, dtype=np.complex128):
+    """
+    Returns the unitary of the population swap between the levels |f0> and
+    |e1> of a qutrit-qubit system. The leakage is a rotation in the |f0>, |e1>
+    subspace by the angle arcsin(sqrt(4*leakage_rate)), i.e., the closed form
+    of the exponential of its generator.
+
+    """
+    cnot = np.diag(np.ones(6, dtype = complex))
+    cnot[3][3] = 0
+    cnot[4][4] = 0
+    cnot[3][4] = 1
+    cnot[4][3] = 1
+
+    theta = np.arcsin(sqrt(4*leakage_rate))
+
+    noisy_unitary = np.diag(np.ones(6, dtype = complex))
+    noisy_unitary[3][3] = np.cos(theta)
+    noisy_unitary[4][4] = np.cos(theta)
+    noisy_unitary[3][4] = np.exp(1j * leakage_phase) * np.sin(theta)
+    noisy_unitary[4][3] = -np.exp(-1j * leakage_phase) * np.sin(theta)
+
+    return (cnot @ noisy_unitary).astype(dtype)
+#
+
+##-- A SWAP between the qubit subspace of a qutrit and a qubit
+def swap_matrix(dtype=np.complex128):
+    return np.array([[1, 0, 0, 0, 0, 0],
+                     [0, 0, 1, 0, 0, 0],
+                     [0, 1, 0, 0, 0, 0],
+                     [0, 0, 0, 1, 0, 0],
+                     [0, 0, 0, 0, 1, 0],
+                     [0, 0, 0, 0, 0, 1]], dtype = dtype)
+#
+
+##-- A CZ between two qutrits, with leakage
+def cz_matrix(angle, leakage_rate, leakage_phase, dtype=np.complex128):
+    """
+    Returns the unitary of the CPHASE between two qutrits exploiting the |ee>
+    to |f0> transition. The leakage is a rotation in the |0f>, |ee> subspace
+    by the angle arcsin(sqrt(4*leakage_rate)).
+
+    """
+    phases = np.zeros(9, dtype = complex)
+    phases[2] = -angle
+    phases[4] = angle
+    ideal_unitary = np.diag(np.exp(1j * phases))
+
+    theta = np.arcsin(sqrt(4*leakage_rate))
+
+    noisy_unitary = np.diag(np.ones(9, dtype = complex))
+    noisy_unitary[2][2] = np.cos(theta)
+    noisy_unitary[4][4] = np.cos(theta)
+    noisy_unitary[2][4] = -np.exp(1j * leakage_phase) * np.sin(theta)
+    noisy_unitary[4][2] = np.exp(-1j * leakage_phase) * np.sin(theta)
+
+    return (ideal_unitary @ noisy_unitary).astype(dtype)
+#
+
+###
+#   Kraus operators
+###
+##-- amplitude damping of a qutrit
+def amplitude_damping_kraus(pro1, pro2, dtype=np.complex128):
+    return np.array([
+        [[0, np.sqrt(pro1), 0], [0, 0, 0], [0, 0, 0]],    # decay |e) -> |g)
+        [[0, 0, 0], [0, 0, np.sqrt(pro2)], [0, 0, 0]],    # decay |f) -> |e)
+        [[1, 0, 0], [0, np.sqrt(1-pro1), 0], [0, 0, np.sqrt(1-pro2)]]
+    ], dtype = dtype)
+#
+
+##-- phase damping of a qutrit
+def phase_damping_kraus(pro1, pro2, dtype=np.complex128):
+    return np.array([
+        [[0, 0, 0], [0, np.sqrt(pro1), 0], [0, 0, 0]],
+        [[0, 0, 0], [0, 0, 0], [0, 0, np.sqrt(pro2)]],
+        [[1, 0, 0], [0, np.sqrt(1-pro1), 0], [0, 0, np.sqrt(1-pro2)]]
+    ], dtype = dtype)
+#
+
+###
+#   Superoperators
+###
+##-- superoperator sum_k K (x) K^* of a unitary or a stack of Kraus operators
+def superoperator(kraus):
+    """
+    Returns the superoperator of a channel acting on the row-major
+    vectorization of the density matrix, vec(rho)[i*d + j] = rho[i, j].
+    kraus is a unitary (d, d) or a stack of Kraus operators (k, d, d).
+
+    """
+    kraus = np.asarray(kraus)
+    if kraus.ndim == 2:
+        kraus = kraus[None]
+    #
+    dim = kraus.shape[-1]
+    return np.einsum("kij,kab->iajb", kraus, kraus.conj()).reshape(dim*dim, dim*dim)
+#
+
+##-- Kraus operators of a superoperator, from the eigenvectors of its Choi matrix
+def superoperator_kraus(superop, atol=1e-14, dtype=np.complex128):
+    superop = np.asarray(superop)
+    dim = int(round(sqrt(superop.shape[0])))
+    choi = superop.reshape(dim, dim, dim, dim).transpose(0, 2, 1, 3).reshape(dim*dim, dim*dim)
+    evals, evecs = np.linalg.eigh(0.5*(choi + choi.conj().T))
+    keep = evals > atol
+    kraus = (evecs[:, keep]*np.sqrt(evals[keep])).T.reshape(-1, dim, dim)
+    return kraus.astype(dtype)
+#
+
+##-- flat float parameters of a superoperator, and back
+def superoperator_params(superop):
+    superop = np.asarray(superop)
+    dim = int(round(sqrt(superop.shape[0])))
+    return np.concatenate([[dim], superop.real.ravel(), superop.imag.ravel()])
+#
+
+def superoperator_from_params(*params):
+    dim = int(params[0])
+    values = np.asarray(params[1:], dtype = float)
+    return (values[:dim**4] + 1j*values[dim**4:]).reshape(dim*dim, dim*dim)
+#
+
+##-- Kraus operators of a superoperator stored as flat parameters
+def superoperator_channel_kraus(*params, dtype=np.complex128):
+    return superoperator_kraus(superoperator_from_params(*params), dtype = dtype)
+#
+
+###
+#   Qubit gates of Cirq used on the photons
+###
+##-- the unitary sum_k exp(i pi t (lambda_k + s)) P_k of a Cirq EigenGate
+def _eigen_matrix(components, exponent, global_shift, dtype):
+    return sum(np.exp(1j*np.pi*exponent*(ll + global_shift))*pp for ll, pp in components).astype(dtype)
+#
+
+def hpow_matrix(exponent, global_shift, dtype=np.complex128):
+    hh = np.array([[1, 1], [1, -1]])/sqrt(2)
+    return _eigen_matrix([(0, (np.eye(2) + hh)/2), (1, (np.eye(2) - hh)/2)], exponent, global_shift, dtype)
+#
+
+def xpow_matrix(exponent, global_shift, dtype=np.complex128):
+    xx = np.array([[0, 1], [1, 0]])
+    return _eigen_matrix([(0, (np.eye(2) + xx)/2), (1, (np.eye(2) - xx)/2)], exponent, global_shift, dtype)
+#
+
+def zpow_matrix(exponent, global_shift, dtype=np.complex128):
+    return _eigen_matrix([(0, np.diag([1, 0])), (1, np.diag([0, 1]))], exponent, global_shift, dtype)
+#
+
+##-- amplitude and phase dmaping probs
+def pad(t, T):
+    return 1-np.exp(-t/T)
+def ppd(t, T1, T2):
+    return 1-np.exp(t/T1)*np.exp(-2*t/T2)
+
+###
+#   Precomputed gate-matrix tables
+###
+##-- the matrix function of every gate and channel of qutrit_utils, and of
+##-- the Cirq qubit gates applied to the photons
+GATE_MATRICES = {
+    "Q3_H": h_matrix,
+    "Q3_S": s_matrix,
+    "Q3_PI_ef": pi_ef_matrix,
+    "Q3_CNOT": cnot_matrix,
+    "Q3_SWAP": swap_matrix,
+    "Q3_CZ": cz_matrix,
+    "Q3_AmplitudeDampingChannel": amplitude_damping_kraus,
+    "Q3_PhaseDampingChannel": phase_damping_kraus,
+    "Q3_SuperoperatorChannel": superoperator_channel_kraus,
+    "HPowGate": hpow_matrix,
+    "XPowGate": xpow_matrix,
+    "ZPowGate": zpow_matrix,
+}
+
+##-- the key of a gate with given parameters in a gate table
+def table_key(name, params):
+    return name + "(" + ",".join(repr(float(pp)) for pp in params) + ")"
+#
+
+##-- precompute the matrices of a list of gates
+def gate_table(gates, dtype=np.complex128):
+    """
+    Returns a dictionary with the matrices (unitaries) or the stacks of Kraus
+    operators (channels) of the gates in gates, a list of (name, params)
+    tuples such as ("Q3_CNOT", (0.01, 0.0)), keyed by table_key(name, params).
+
+    """
+    table = {}
+    for name, params in gates:
+        table[table_key(name, params)] = GATE_MATRICES[name](*params, dtype = dtype)
+    #
+    return table
+#
+
+##-- the table of the gates and idle channels of a sweep point
+def idle_gate_table(times, coherence_times, gates=(), dtype=np.complex128):
+    """
+    Returns the gate table of the amplitude and phase damping channels of
+    the idle times in times for every coherence-time tuple in coherence_times,
+    plus the gates in gates, i.e., every matrix the noisy builders need at
+    one sweep point.
+
+    """
+    entries = list(gates)
+    for T1_e, T2_e, T1_f, T2_f in coherence_times:
+        for tt in times:
+            entries.append(("Q3_AmplitudeDampingChannel", (pad(tt, T1_e), pad(tt, T1_f))))
+            entries.append(("Q3_PhaseDampingChannel", (ppd(tt, T1_e, T2_e), ppd(tt, T1_f, T2_f))))
+        #
+    #
+    return gate_table(entries, dtype)
+#
+
+##-- store and load a gate table, e.g., to ship it to worker processes
+def save_gate_table(path, table):
+    np.savez(path, **table)
+#
+
+def load_gate_table(path):
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+    #
+#
@@ -8,7 +8,7 @@ import numpy as np
 
 import cirq
 
-import qutrit_utils
+from . import qutrit_utils
 
 ###
 #   Utilities to build the circuit to prepare different states
@@ -46,12 +46,51 @@ def ideal_cluster_state_1D(Nqubits):
     return ics_circuit
 #
 
-##-- prepare the noisy cluster state in 1D
-def noisy_cluster_state_1D(Nqubits, wait_ts, ctimes_s1, noise_params):
-    ##-- parameters
+##-- one emission of the noisy cluster state in 1D
+def noisy_cluster_state_1D_step(cs_circuit, storage, photon, wait_ts, ctimes_s1, noise_params):
     t1, t2, t3, t4, t5 = wait_ts
     l1_cnot, sq_gamma = noise_params
 
+    #- hadamard
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storage, cs_circuit)
+    ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on(storage)
+    cs_circuit.append(ry)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storage, cs_circuit)
+
+    #- cnot
+    #pi pulse
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storage, cs_circuit)
+    pi_ef = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storage)
+    cs_circuit.append(pi_ef)
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storage, cs_circuit)
+
+    # excitation transfer
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storage, cs_circuit)
+    cn = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storage, photon)
+    cs_circuit.append(cn)
+    qutrit_utils.Q3_idle_time(t3/2 + t4, ctimes_s1, storage, cs_circuit)
+#
+
+##-- the last emission (swap) of the noisy cluster state in 1D
+def noisy_cluster_state_1D_last_step(cs_circuit, storage, photon, wait_ts, ctimes_s1, noise_params):
+    t1, t2, t3, t4, t5 = wait_ts
+    l1_cnot, sq_gamma = noise_params
+
+    #-hadamard
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storage, cs_circuit)
+    ha = qutrit_utils.Q3_H(np.pi - sq_gamma).on(storage)
+    cs_circuit.append(ha)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storage, cs_circuit)
+
+    #-swap
+    qutrit_utils.Q3_idle_time(t5/2, ctimes_s1, storage, cs_circuit)
+    sw = qutrit_utils.Q3_SWAP().on(storage, photon)
+    cs_circuit.append(sw)
+    qutrit_utils.Q3_idle_time(t5/2, ctimes_s1, storage, cs_circuit)
+#
+
+##-- prepare the noisy cluster state in 1D
+def noisy_cluster_state_1D(Nqubits, wait_ts, ctimes_s1, noise_params):
     ##-- defining the qubits
     register = [cirq.LineQid(0, dimension=3),
             *cirq.LineQubit.range(1, Nqubits+1)]
@@ -60,37 +99,10 @@ def noisy_cluster_state_1D(Nqubits, wait_ts, ctimes_s1, noise_params):
     cs_circuit = cirq.Circuit()
 
     for ii in range(Nqubits, 1, -1):
-        #- hadamard
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, register[0], cs_circuit)
-        ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on(register[0])
-        cs_circuit.append(ry)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, register[0], cs_circuit)
-
-        #- cnot
-        #pi pulse
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, register[0], cs_circuit)
-        pi_ef = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(register[0])
-        cs_circuit.append(pi_ef)
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, register[0], cs_circuit)
-
-        # excitation transfer
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, register[0], cs_circuit)
-        cn = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(register[0], register[ii])
-        cs_circuit.append(cn)
-        qutrit_utils.Q3_idle_time(t3/2 + t4, ctimes_s1, register[0], cs_circuit)
+        noisy_cluster_state_1D_step(cs_circuit, register[0], register[ii], wait_ts, ctimes_s1, noise_params)
     #
     ## The last emission
-    #-hadamard
-    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, register[0], cs_circuit)
-    ha = qutrit_utils.Q3_H(np.pi - sq_gamma).on(register[0])
-    cs_circuit.append(ha)
-    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, register[0], cs_circuit)
-
-    #-swap
-    qutrit_utils.Q3_idle_time(t5/2, ctimes_s1, register[0], cs_circuit)
-    sw = qutrit_utils.Q3_SWAP().on(register[0], register[1])
-    cs_circuit.append(sw)
-    qutrit_utils.Q3_idle_time(t5/2, ctimes_s1, register[0], cs_circuit)
+    noisy_cluster_state_1D_last_step(cs_circuit, register[0], register[1], wait_ts, ctimes_s1, noise_params)
 
     return cs_circuit
 #
@@ -154,67 +166,59 @@ def leak_cluster_state_2D(Nqubits, gamma, l1_cz, l1_cnot):
     return cs_circuit
 #
 
-##-- prepare noisy cluster state in 2D
-def noisy_cluster_state_2D(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_params):
-
-    ##-- parameters
+##-- one pair of emissions of the noisy cluster state in 2D
+def noisy_cluster_state_2D_step(cs_circuit, storages, photon1, photon2, wait_ts, ctimes_s1, ctimes_s2, noise_params):
     t1, t2, t3, t4, t5, tsw1, tsw2 = wait_ts
     gamma, l1_cz, l1_cnot, sq_gamma = noise_params
 
-    ##-- defining the qubits
-    half = int(Nqubits/2)
-    storages = cirq.LineQid.range(0, 2, dimension=3)
-
-    qubits = cirq.LineQubit.range(2, Nqubits+2)
-    row1 = qubits[::2]
-    row2 = qubits[1::2]
-
-    ##-- initializing the circuit
-    cs_circuit = cirq.Circuit()
-
-    for ii in range(half-1, 0, -1):
-        #-- the hadamards
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
-
-        ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on_each(storages[0], storages[1])
-        cs_circuit.append(ry)
+    #-- the hadamards
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
 
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
+    ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on_each(storages[0], storages[1])
+    cs_circuit.append(ry)
 
-        #-- the CZ
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s2, storages[1], cs_circuit)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
 
-        cz = qutrit_utils.Q3_CZ(np.pi - gamma, l1_cz, 0.0).on(storages[0], storages[1])
-        cs_circuit.append(cz)
+    #-- the CZ
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s2, storages[1], cs_circuit)
 
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t2/2, ctimes_s2, storages[1], cs_circuit)
+    cz = qutrit_utils.Q3_CZ(np.pi - gamma, l1_cz, 0.0).on(storages[0], storages[1])
+    cs_circuit.append(cz)
 
-        ##-- add the CNOT
-        #- first storage
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
-        pi_ef1 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[0])
-        cs_circuit.append(pi_ef1)
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t2/2, ctimes_s2, storages[1], cs_circuit)
 
-        qutrit_utils.Q3_idle_time(t4/2, ctimes_s1, storages[0], cs_circuit)
-        cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], row1[ii])
-        cs_circuit.append(cn1)
-        qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s1, storages[0], cs_circuit)
+    ##-- add the CNOT
+    #- first storage
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+    pi_ef1 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[0])
+    cs_circuit.append(pi_ef1)
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+
+    qutrit_utils.Q3_idle_time(t4/2, ctimes_s1, storages[0], cs_circuit)
+    cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], photon1)
+    cs_circuit.append(cn1)
+    qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s1, storages[0], cs_circuit)
+
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
+    pi_ef2 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[1])
+    cs_circuit.append(pi_ef2)
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
+
+    qutrit_utils.Q3_idle_time(t4/2, ctimes_s2, storages[1], cs_circuit)
+    cn2 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[1], photon2)
+    cs_circuit.append(cn2)
+    qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s2, storages[1], cs_circuit)
+#
 
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
-        pi_ef2 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[1])
-        cs_circuit.append(pi_ef2)
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
+##-- the last pair of emissions (swaps) of the noisy cluster state in 2D
+def noisy_cluster_state_2D_last_step(cs_circuit, storages, photon1, photon2, wait_ts, ctimes_s1, ctimes_s2, noise_params):
+    t1, t2, t3, t4, t5, tsw1, tsw2 = wait_ts
+    gamma, l1_cz, l1_cnot, sq_gamma = noise_params
 
-        qutrit_utils.Q3_idle_time(t4/2, ctimes_s2, storages[1], cs_circuit)
-        cn2 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[1], row2[ii])
-        cs_circuit.append(cn2)
-        qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s2, storages[1], cs_circuit)
-    #
     #-- the hadamards
     qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
     qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
@@ -237,14 +241,36 @@ def noisy_cluster_state_2D(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_params)
 
     #-- the swaps
     qutrit_utils.Q3_idle_time(tsw1/2, ctimes_s1, storages[0], cs_circuit)
-    sw1 = qutrit_utils.Q3_SWAP().on(storages[0], row1[0])
+    sw1 = qutrit_utils.Q3_SWAP().on(storages[0], photon1)
     cs_circuit.append(sw1)
     qutrit_utils.Q3_idle_time(tsw1/2, ctimes_s1, storages[0], cs_circuit)
 
     qutrit_utils.Q3_idle_time(tsw2/2, ctimes_s2, storages[1], cs_circuit)
-    sw2 = qutrit_utils.Q3_SWAP().on(storages[1], row2[0])
+    sw2 = qutrit_utils.Q3_SWAP().on(storages[1], photon2)
     cs_circuit.append(sw2)
     qutrit_utils.Q3_idle_time(tsw2/2, ctimes_s2, storages[1], cs_circuit)
+#
+
+##-- prepare noisy cluster state in 2D
+def noisy_cluster_state_2D(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_params):
+
+    ##-- defining the qubits
+    half = int(Nqubits/2)
+    storages = cirq.LineQid.range(0, 2, dimension=3)
+
+    qubits = cirq.LineQubit.range(2, Nqubits+2)
+    row1 = qubits[::2]
+    row2 = qubits[1::2]
+
+    ##-- initializing the circuit
+    cs_circuit = cirq.Circuit()
+
+    for ii in range(half-1, 0, -1):
+        noisy_cluster_state_2D_step(cs_circuit, storages, row1[ii], row2[ii],
+                                    wait_ts, ctimes_s1, ctimes_s2, noise_params)
+    #
+    noisy_cluster_state_2D_last_step(cs_circuit, storages, row1[0], row2[0],
+                                     wait_ts, ctimes_s1, ctimes_s2, noise_params)
 
     return cs_circuit
 #
@@ -538,27 +564,12 @@ def leak_ring_cluster_state(Nqubits, gamma, l1_cz, l1_cnot):
     return cs_circuit
 #
 
-##-- prepare noisy ring cluster state
-def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_params):
-
-    ##-- parameters
+##-- the first link of the noisy ring cluster state, emitting the first photon
+##-- of the longer side when photon is not None
+def noisy_ring_cluster_state_first_step(cs_circuit, storages, photon, wait_ts, ctimes_s1, ctimes_s2, noise_params):
     t1, t2, t3, t4, t5, tsw1, tsw2 = wait_ts
     gamma, l1_cz, l1_cnot, sq_gamma = noise_params
 
-    ##-- defining the qubits
-    half = int(Nqubits/2)
-    storages = cirq.LineQid.range(0, 2, dimension=3)
-
-    qubits = cirq.LineQubit.range(2, Nqubits+2)
-    row1 = qubits[::2]
-    row2 = qubits[1::2]
-
-    ##-- find the number of steps in the loop
-    nsteps = len(row2)
-
-    ##-- initializing the circuit
-    cs_circuit = cirq.Circuit()
-
     #-- the hadamards
     qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
     qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
@@ -576,7 +587,7 @@ def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_param
     qutrit_utils.Q3_idle_time(t2/2, ctimes_s2, storages[1], cs_circuit)
 
     ##-- emit the first photon on the longer side (only when sides are not same length)
-    if len(row1) != len(row2):
+    if photon is not None:
         ##-- add the CNOT
         qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
         pi_ef1 = qutrit_utils.Q3_PI_ef(np.pi).on(storages[0])
@@ -584,7 +595,7 @@ def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_param
         qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
 
         qutrit_utils.Q3_idle_time(t4/2, ctimes_s1, storages[0], cs_circuit)
-        cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], row1[-1])
+        cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], photon)
         cs_circuit.append(cn1)
         qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s1, storages[0], cs_circuit)
 
@@ -600,39 +611,49 @@ def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_param
         ## the second storage idles while we apply hadamard on storage 1
         qutrit_utils.Q3_idle_time(t1, ctimes_s1, storages[1], cs_circuit)
     #
+#
 
-    for ii in range(nsteps-1, 0, -1):
-        ##-- add the CNOT
-        #- first storage
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
-        pi_ef1 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[0])
-        cs_circuit.append(pi_ef1)
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+##-- one pair of emissions of the noisy ring cluster state
+def noisy_ring_cluster_state_step(cs_circuit, storages, photon1, photon2, wait_ts, ctimes_s1, ctimes_s2, noise_params):
+    t1, t2, t3, t4, t5, tsw1, tsw2 = wait_ts
+    gamma, l1_cz, l1_cnot, sq_gamma = noise_params
 
-        qutrit_utils.Q3_idle_time(t4/2, ctimes_s1, storages[0], cs_circuit)
-        cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], row1[ii])
-        cs_circuit.append(cn1)
-        qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s1, storages[0], cs_circuit)
+    ##-- add the CNOT
+    #- first storage
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+    pi_ef1 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[0])
+    cs_circuit.append(pi_ef1)
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s1, storages[0], cs_circuit)
+
+    qutrit_utils.Q3_idle_time(t4/2, ctimes_s1, storages[0], cs_circuit)
+    cn1 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[0], photon1)
+    cs_circuit.append(cn1)
+    qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s1, storages[0], cs_circuit)
+
+    #- second storage
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
+    pi_ef2 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[1])
+    cs_circuit.append(pi_ef2)
+    qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
+
+    qutrit_utils.Q3_idle_time(t4/2, ctimes_s2, storages[1], cs_circuit)
+    cn2 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[1], photon2)
+    cs_circuit.append(cn2)
+    qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s2, storages[1], cs_circuit)
 
-        #- second storage
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
-        pi_ef2 = qutrit_utils.Q3_PI_ef(np.pi - sq_gamma).on(storages[1])
-        cs_circuit.append(pi_ef2)
-        qutrit_utils.Q3_idle_time(t3/2, ctimes_s2, storages[1], cs_circuit)
-
-        qutrit_utils.Q3_idle_time(t4/2, ctimes_s2, storages[1], cs_circuit)
-        cn2 = qutrit_utils.Q3_CNOT(l1_cnot, 0.0).on(storages[1], row2[ii])
-        cs_circuit.append(cn2)
-        qutrit_utils.Q3_idle_time(t4/2 + t5, ctimes_s2, storages[1], cs_circuit)
+    #-- the hadamards
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
+    ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on_each(storages[0], storages[1])
+    cs_circuit.append(ry)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
+    qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
+#
 
-        #-- the hadamards
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
-        ry = qutrit_utils.Q3_H(np.pi - sq_gamma).on_each(storages[0], storages[1])
-        cs_circuit.append(ry)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s1, storages[0], cs_circuit)
-        qutrit_utils.Q3_idle_time(t1/2, ctimes_s2, storages[1], cs_circuit)
-    #
+##-- the last link (swaps) of the noisy ring cluster state
+def noisy_ring_cluster_state_last_step(cs_circuit, storages, photon1, photon2, wait_ts, ctimes_s1, ctimes_s2, noise_params):
+    t1, t2, t3, t4, t5, tsw1, tsw2 = wait_ts
+    gamma, l1_cz, l1_cnot, sq_gamma = noise_params
 
     #-- the cz
     qutrit_utils.Q3_idle_time(t2/2, ctimes_s1, storages[0], cs_circuit)
@@ -644,14 +665,42 @@ def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_param
 
     #-- the swaps
     qutrit_utils.Q3_idle_time(tsw1/2, ctimes_s1, storages[0], cs_circuit)
-    sw1 = qutrit_utils.Q3_SWAP().on(storages[0], row1[0])
+    sw1 = qutrit_utils.Q3_SWAP().on(storages[0], photon1)
     cs_circuit.append(sw1)
     qutrit_utils.Q3_idle_time(tsw1/2, ctimes_s1, storages[0], cs_circuit)
 
     qutrit_utils.Q3_idle_time(tsw2/2, ctimes_s2, storages[1], cs_circuit)
-    sw2 = qutrit_utils.Q3_SWAP().on(storages[1], row2[0])
+    sw2 = qutrit_utils.Q3_SWAP().on(storages[1], photon2)
     cs_circuit.append(sw2)
     qutrit_utils.Q3_idle_time(tsw2/2, ctimes_s2, storages[1], cs_circuit)
+#
+
+##-- prepare noisy ring cluster state
+def noisy_ring_cluster_state(Nqubits, wait_ts, ctimes_s1, ctimes_s2, noise_params):
+
+    ##-- defining the qubits
+    storages = cirq.LineQid.range(0, 2, dimension=3)
+
+    qubits = cirq.LineQubit.range(2, Nqubits+2)
+    row1 = qubits[::2]
+    row2 = qubits[1::2]
+
+    ##-- find the number of steps in the loop
+    nsteps = len(row2)
+
+    ##-- initializing the circuit
+    cs_circuit = cirq.Circuit()
+
+    noisy_ring_cluster_state_first_step(cs_circuit, storages, row1[-1] if len(row1) != len(row2) else None,
+                                        wait_ts, ctimes_s1, ctimes_s2, noise_params)
+
+    for ii in range(nsteps-1, 0, -1):
+        noisy_ring_cluster_state_step(cs_circuit, storages, row1[ii], row2[ii],
+                                      wait_ts, ctimes_s1, ctimes_s2, noise_params)
+    #
+
+    noisy_ring_cluster_state_last_step(cs_circuit, storages, row1[0], row2[0],
+                                       wait_ts, ctimes_s1, ctimes_s2, noise_params)
 
     return cs_circuit
 #
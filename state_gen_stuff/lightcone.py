@@ -0,0 +1,283 @@
+###
+#   This module computes reduced states of the photons on small supports (node
+#   neighbourhoods, edge supports) directly from a sequential emission circuit,
+#   without the full N-photon density matrix.
+#
+#   The circuit is run on a density tensor that only holds the qids inside the
+#   light cone of the current operation: a qid is added (in |0>) when it is
+#   first touched and traced out right after its last operation, unless it is
+#   in the target support. Since a photon is never touched again after its
+#   CNOT/SWAP, each marginal costs the dimension of the storages times the
+#   dimension of the support.
+###
+
+### loading some moduels
+import numpy as np
+
+import cirq
+
+from . import circuit_codec
+from . import gate_matrices
+from . import witness_sampling
+
+###
+#   Density tensors
+###
+##-- apply a stack of Kraus operators to some axes of a density tensor
+def apply_kraus(tensor, kraus, axes, nqids, nbatch=0):
+    """
+    Returns sum_k K_k rho K_k^dagger, where rho is stored as a tensor with
+    nbatch leading batch axes followed by the nqids ket axes and the nqids bra
+    axes, and kraus has shape (k, d_1,..,d_n, d_1,..,d_n) for the n qids at
+    the positions in axes.
+
+    """
+    nn = len(axes)
+    left = [nbatch + aa for aa in axes]
+    right = [nbatch + nqids + aa for aa in axes]
+    inner = list(range(nn, 2*nn))
+
+    out = None
+    for kk in kraus:
+        tmp = np.moveaxis(np.tensordot(kk, tensor, axes=(inner, left)), list(range(nn)), left)
+        tmp = np.moveaxis(np.tensordot(kk.conj(), tmp, axes=(inner, right)), list(range(nn)), right)
+        out = tmp if out is None else out + tmp
+    #
+    return out
+#
+
+##-- apply a batch of Kraus stacks, one per batch element, to a batch of density tensors
+def apply_batched_kraus(tensor, kraus, axes, nqids):
+    """
+    Same as apply_kraus for a tensor with one leading batch axis of length B
+    and kraus of shape (B, k, d_1,..,d_n, d_1,..,d_n), where batch element b
+    of the tensor evolves with the Kraus operators kraus[b].
+
+    """
+    nn = len(axes)
+    batch, nkraus = kraus.shape[:2]
+    dim = int(np.prod(kraus.shape[2:2 + nn]))
+    kraus = kraus.reshape(batch, nkraus, dim, dim)
+    front = list(range(2, 2 + nn))
+
+    ##-- K rho on the ket axes, one batched matmul for all the Kraus operators
+    tmp = np.moveaxis(tensor, [1 + aa for aa in axes], [1 + ff for ff in range(nn)])
+    shape = tmp.shape
+    tmp = np.matmul(kraus, tmp.reshape(batch, 1, dim, -1)).reshape((batch, nkraus) + shape[1:])
+    tmp = np.moveaxis(tmp, front, [2 + aa for aa in axes])
+
+    ##-- (K rho) K^dagger on the bra axes, summed over the Kraus operators
+    right = [2 + nqids + aa for aa in axes]
+    tmp = np.moveaxis(tmp, right, front)
+    shape = tmp.shape
+    tmp = np.matmul(kraus.conj(), tmp.reshape(batch, nkraus, dim, -1)).reshape(shape)
+    return np.moveaxis(tmp, front, right).sum(axis=1)
+#
+
+##-- add a qid in |0> as the last ket and bra axes of a density tensor
+def allocate_qid(tensor, nqids, dimension, nbatch=0):
+    ground = np.zeros((dimension, dimension), dtype=tensor.dtype)
+    ground[0, 0] = 1
+    tensor = np.multiply.outer(tensor, ground)
+    return np.moveaxis(tensor, -2, nbatch + nqids)
+#
+
+##-- trace out the qid at a given position of a density tensor
+def trace_qid(tensor, position, nqids, nbatch=0):
+    return np.trace(tensor, axis1=nbatch + position, axis2=nbatch + nqids + position)
+#
+
+###
+#   Light-cone simulation
+###
+##-- the Kraus operators of every operation and the first and last touch of every qid
+def circuit_schedule(circuit, table=None):
+    """
+    Returns a dictionary with the sorted qids of the circuit, the list of its
+    operations in order as (qids, Kraus stack) pairs, with the Kraus stacks
+    reshaped for apply_kraus, and the index of the first and last operation
+    acting on each qid.
+
+    The matrices of the gates that circuit_codec can encode are looked up in
+    table, a gate table of gate_matrices (e.g., idle_gate_table of the sweep
+    point, or one loaded with load_gate_table), and the missing ones are
+    added to it, so each distinct gate is computed only once.
+
+    """
+    table = {} if table is None else table
+    ops = []
+    first = {}
+    last = {}
+    for kk, op in enumerate(circuit.all_operations()):
+        shape = [qq.dimension for qq in op.qubits]
+        name = circuit_codec.gate_name(op.gate)
+        if name is not None:
+            key = gate_matrices.table_key(name, circuit_codec.gate_params(op.gate))
+            if key not in table:
+                table.update(gate_matrices.gate_table([(name, circuit_codec.gate_params(op.gate))]))
+            #
+            kraus = np.asarray(table[key], dtype=getattr(op.gate, "dtype", np.complex128))
+        else:
+            kraus = np.array(cirq.kraus(op))
+        #
+        ops.append((op.qubits, kraus.reshape([-1] + shape + shape)))
+        for qq in op.qubits:
+            first.setdefault(qq, kk)
+            last[qq] = kk
+        #
+    #
+    return {"qids": sorted(circuit.all_qubits()), "ops": ops, "first": first, "last": last, "batch": None}
+#
+
+##-- the schedule of a batch of circuits with the same operations and different parameters
+def batched_schedule(circuits, table=None):
+    """
+    Returns the schedule of a list of B circuits that only differ in the
+    parameters of their gates and channels (e.g., the same builder at
+    different sweep points), with the Kraus stacks of each operation stacked
+    along a leading batch axis of length B, so simulate_marginal runs all of
+    them in a single pass. The circuits share the gate table (see
+    circuit_schedule).
+
+    """
+    table = {} if table is None else table
+    schedules = [circuit_schedule(cc, table) for cc in circuits]
+    schedule = schedules[0]
+    ops = []
+    for kk, (qubits, kraus) in enumerate(schedule["ops"]):
+        for other in schedules[1:]:
+            if other["ops"][kk][0] != qubits or other["ops"][kk][1].shape != kraus.shape:
+                raise ValueError("the circuits of a batch must have the same operations")
+            #
+        #
+        ops.append((qubits, np.stack([ss["ops"][kk][1] for ss in schedules])))
+    #
+    return dict(schedule, ops=ops, batch=len(circuits))
+#
+
+##-- the reduced density matrix of a support, simulating only its light cone
+def simulate_marginal(schedule, support):
+    """
+    Returns the density matrix of the qids in support (in sorted order) at the
+    end of the circuit of schedule (see circuit_schedule), and the largest
+    number of qids held at once during the simulation. For a batched schedule
+    the density matrices carry a leading batch axis.
+
+    """
+    support = set(support)
+    dtype = np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]])
+    batch = schedule.get("batch")
+    nbatch = 0 if batch is None else 1
+    tensor = np.ones(() if batch is None else (batch,), dtype=dtype)
+    active = []
+    peak = 0
+
+    for kk, (qubits, kraus) in enumerate(schedule["ops"]):
+        for qq in qubits:
+            if qq not in active:
+                tensor = allocate_qid(tensor, len(active), qq.dimension, nbatch)
+                active.append(qq)
+            #
+        #
+        peak = max(peak, len(active))
+        axes = [active.index(qq) for qq in qubits]
+        if batch is None:
+            tensor = apply_kraus(tensor, kraus, axes, len(active))
+        else:
+            tensor = apply_batched_kraus(tensor, kraus, axes, len(active))
+        #
+
+        for qq in qubits:
+            if schedule["last"][qq] == kk and qq not in support:
+                tensor = trace_qid(tensor, active.index(qq), len(active), nbatch)
+                active.remove(qq)
+            #
+        #
+    #
+    ##-- qids of the support never touched by the circuit stay in |0>
+    for qq in sorted(support):
+        if qq not in active:
+            tensor = allocate_qid(tensor, len(active), qq.dimension, nbatch)
+            active.append(qq)
+        #
+    #
+
+    nqids = len(active)
+    order = [nbatch + active.index(qq) for qq in sorted(support)]
+    tensor = tensor.transpose(list(range(nbatch)) + order + [nqids + oo for oo in order])
+    dim = int(np.prod([qq.dimension for qq in support]))
+    return tensor.reshape(tensor.shape[:nbatch] + (dim, dim)), peak
+#
+
+##-- the full density matrix, adding each qid to the state on its first touch
+def simulate_lazy(circuit, schedule=None):
+    """
+    Returns the final density matrix of the register (qids in sorted order)
+    and its qid shape, as precision.simulate_density_matrix. The photons only
+    enter the simulated state at their emission and nothing is traced out,
+    so the operations before the emission of the k-th photon act on a state
+    2^(N-k) times smaller than the full register.
+
+    """
+    if schedule is None:
+        schedule = circuit_schedule(circuit)
+    #
+    rho, _ = simulate_marginal(schedule, schedule["qids"])
+    return rho, tuple(qq.dimension for qq in schedule["qids"])
+#
+
+##-- reduced density matrices of the photons on several supports
+def marginal_states(circuit, supports, schedule=None):
+    """
+    Returns a dictionary mapping each support, a tuple of node labels (node k
+    is the k-th photon of the register in sorted order), to the reduced
+    density matrix of those photons.
+
+    """
+    if schedule is None:
+        schedule = circuit_schedule(circuit)
+    #
+    photons = [qq for qq in schedule["qids"] if qq.dimension == 2]
+    states = {}
+    for support in supports:
+        support = tuple(sorted(support))
+        if support not in states:
+            states[support], _ = simulate_marginal(schedule, [photons[nn] for nn in support])
+        #
+    #
+    return states
+#
+
+##-- expectation values of local Pauli operators from their marginals
+def marginal_expectation_values(circuit, paulis, schedule=None):
+    """
+    Returns the expectation values of the Pauli operators in paulis, each one
+    a {node: Pauli} dictionary (see witness_sampling.node_paulis), evaluated on
+    the reduced state of its support. Operators with the same support share
+    one light-cone simulation. For a batched schedule the values have shape
+    (B, len(paulis)).
+
+    """
+    states = marginal_states(circuit, [tuple(pp) for pp in paulis], schedule)
+    values = []
+    for pauli in paulis:
+        support = tuple(sorted(pauli))
+        op = witness_sampling.pauli_operator("".join(pauli[nn] for nn in support))
+        values.append(np.einsum("...ij,ji->...", states[support], op).real)
+    #
+    return np.stack(values, axis=-1)
+#
+
+##-- the witness of a generation circuit from the marginals of its stabilizers
+def lightcone_witness(circuit, graph, witness=witness_sampling.toth_guhne_witness):
+    """
+    Returns the node generators and edge products of the target graph in the
+    notebook format ({"tag": [...], "value": [...]}) and the witness, for the
+    state prepared by circuit, evaluated with marginal_expectation_values.
+
+    """
+    nodes = witness_sampling.node_paulis(graph)
+    edges = witness_sampling.edge_paulis(graph)
+    values = marginal_expectation_values(circuit, nodes + edges)
+    return witness_sampling.witness_result(nodes, edges, values[:len(nodes)], values[len(nodes):], witness)
+#
@@ -0,0 +1,157 @@
+###
+#   This module is a low-rank density-matrix backend for the generation
+#   circuits. The state is stored as rho = L L^dagger, with a factor L of
+#   shape (D, r) for a register of dimension D. A unitary maps L to U L; a
+#   channel with Kraus operators K_1..K_k maps L to [K_1 L, .., K_k L], whose
+#   rank is then truncated back with an SVD, keeping track of the discarded
+#   weight (the trace dropped by the truncations). Memory and time scale as
+#   r*D instead of D^2.
+###
+
+### loading some moduels
+import numpy as np
+
+from . import lightcone
+from . import witness_sampling
+
+###
+#   Factored states
+###
+##-- apply a stack of Kraus operators to some axes of a factor
+def apply_kraus_factor(factor, kraus, axes):
+    """
+    Returns the factor [K_1 L, .., K_k L] with the Kraus operators in kraus,
+    of shape (k, d_1,..,d_n, d_1,..,d_n), applied on the qids at the
+    positions in axes of factor, a tensor with one axis per qid followed by
+    the rank axis.
+
+    """
+    nn = len(axes)
+    inner = list(range(nn, 2*nn))
+    out = [np.moveaxis(np.tensordot(kk, factor, axes=(inner, axes)), list(range(nn)), axes) for kk in kraus]
+    return np.concatenate(out, axis=-1)
+#
+
+##-- truncate the rank of a factor with an SVD
+def truncate_factor(factor, max_rank, tol):
+    """
+    Returns the factor U S of the largest singular values of factor (at most
+    max_rank of them, dropping the weights s^2 below tol times the trace) and
+    the discarded weight, i.e., the sum of the dropped s^2.
+
+    """
+    shape = factor.shape[:-1]
+    matrix = factor.reshape(-1, factor.shape[-1])
+    uu, ss, _ = np.linalg.svd(matrix, full_matrices=False)
+    weights = ss**2
+    keep = min(max_rank, int(np.count_nonzero(weights > tol*weights.sum())))
+    keep = max(keep, 1)
+    truncated = (uu[:, :keep]*ss[:keep]).reshape(shape + (keep,))
+    return truncated, float(weights[keep:].sum())
+#
+
+###
+#   Simulation
+###
+##-- run a circuit on a low-rank factor
+def simulate_low_rank(circuit, max_rank=16, tol=1e-12):
+    """
+    Returns the final factor L (of shape (D, r), with rho = L L^dagger in the
+    order of the sorted qids), the qid shape of the register and a report with
+    the final and peak rank, the total discarded weight, the number of
+    truncations and the memory of the factor against that of the full
+    density matrix.
+
+    """
+    schedule = lightcone.circuit_schedule(circuit)
+    qids = schedule["qids"]
+    index = {qq: ii for ii, qq in enumerate(qids)}
+    qid_shape = tuple(qq.dimension for qq in qids)
+    dtype = np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]])
+
+    factor = np.zeros(qid_shape + (1,), dtype=dtype)
+    factor[(0,)*len(qids)] = 1
+    report = {"peak_rank": 1, "discarded_weight": 0.0, "truncations": 0}
+
+    for qubits, kraus in schedule["ops"]:
+        factor = apply_kraus_factor(factor, kraus, [index[qq] for qq in qubits])
+        report["peak_rank"] = max(report["peak_rank"], factor.shape[-1])
+        if len(kraus) > 1:
+            factor, discarded = truncate_factor(factor, max_rank, tol)
+            report["discarded_weight"] += discarded
+            report["truncations"] += 1
+        #
+    #
+    dim = int(np.prod(qid_shape))
+    factor = factor.reshape(dim, -1)
+    report["rank"] = factor.shape[1]
+    report["nbytes_factor"] = factor.nbytes
+    report["nbytes_full"] = dim*dim*factor.itemsize
+    return factor, qid_shape, report
+#
+
+##-- the full density matrix of a factor (for small registers)
+def density_matrix(factor):
+    return factor @ factor.conj().T
+#
+
+###
+#   Evaluation on the factor
+###
+##-- the factor of the qubit register, tracing out the storages
+def register_factor(factor, qid_shape):
+    """
+    Returns a factor M of the reduced state of the qubits (rho_reg = M M^dagger),
+    moving every qid of dimension different from 2 into the rank axis.
+
+    """
+    qid_shape = tuple(qid_shape)
+    keep = [ii for ii in range(len(qid_shape)) if qid_shape[ii] == 2]
+    trace = [ii for ii in range(len(qid_shape)) if qid_shape[ii] != 2]
+    tensor = factor.reshape(qid_shape + (-1,)).transpose(keep + trace + [len(qid_shape)])
+    return tensor.reshape(2**len(keep), -1)
+#
+
+##-- expectation values of Pauli strings on a register factor
+def factor_expectation_values(factor, paulis):
+    """
+    Returns Tr(P M M^dagger) = sum_j m_j^dagger P m_j for the Pauli strings
+    in paulis, without building the density matrix. The values are not
+    renormalized after truncations, so each one is off by at most the
+    discarded weight.
+
+    """
+    nqubits = int(round(np.log2(factor.shape[0])))
+    tensor = factor.reshape((2,)*nqubits + (-1,))
+    values = np.zeros(len(paulis))
+    for ii, pauli in enumerate(paulis):
+        image = tensor
+        for qq, pp in enumerate(pauli):
+            if pp != "I":
+                image = np.moveaxis(np.tensordot(witness_sampling.PAULI_MATRICES[pp], image, axes=([1], [qq])), 0, qq)
+            #
+        #
+        values[ii] = np.vdot(tensor, image).real
+    #
+    return values
+#
+
+##-- the witness of a generation circuit with the low-rank backend
+def low_rank_witness(circuit, graph, max_rank=16, tol=1e-12, witness=witness_sampling.toth_guhne_witness):
+    """
+    Returns the node generators and edge products of the target graph in the
+    notebook format ({"tag": [...], "value": [...]}), the witness and the
+    report of simulate_low_rank.
+
+    """
+    factor, qid_shape, report = simulate_low_rank(circuit, max_rank, tol)
+    reg = register_factor(factor, qid_shape)
+    nodes = witness_sampling.node_pauli_strings(graph)
+    edges = witness_sampling.edge_pauli_strings(graph)
+    node_values = factor_expectation_values(reg, nodes)
+    edge_values = factor_expectation_values(reg, edges)
+
+    result = witness_sampling.witness_result(nodes, edges, node_values, edge_values, witness)
+    result["report"] = report
+    return result
+#
@@ -0,0 +1,162 @@
+###
+#   This module groups Pauli strings (node generators, edge products, or any
+#   list of stabilizers) into qubit-wise commuting measurement settings: two
+#   strings commute qubit-wise when, on every qubit, one of them is the
+#   identity or both have the same Pauli, so both are read from the outcomes
+#   of one product-basis measurement. The fewer the settings, the fewer the
+#   basis rotations of the simulated state and the measurement settings of
+#   an experiment.
+#
+#   The strings are the vertices of a conflict graph (an edge between two
+#   strings that do not commute qubit-wise) and each colour of a colouring of
+#   that graph is a setting. The colouring is DSATUR (the uncoloured string
+#   with the most differently coloured conflicts goes first), which is exact
+#   for 2-colourable conflict graphs, e.g., the node generators of a
+#   bipartite graph state fit into the two settings X on one side and Z on
+#   the other. The register state is then rotated once per setting and every
+#   string of the setting is read from the parities of the rotated diagonal.
+###
+
+### loading some moduels
+import numpy as np
+
+from . import stabilizer_sets
+from . import witness_sampling
+
+###
+#   Grouping
+###
+##-- the conflict graph of Pauli strings given by their X and Z bit arrays
+def conflict_graph(xx, zz, chunk=64):
+    """
+    Returns the (M, M) boolean matrix that is True for the pairs of strings
+    that do not commute qubit-wise, i.e., that have different non-identity
+    Paulis on some qubit.
+
+    """
+    xx = np.asarray(xx, dtype=bool)
+    zz = np.asarray(zz, dtype=bool)
+    support = xx | zz
+    conflicts = np.zeros((len(xx), len(xx)), dtype=bool)
+    for start in range(0, len(xx), chunk):
+        rows = slice(start, start + chunk)
+        differ = (xx[rows, None, :] != xx[None, :, :]) | (zz[rows, None, :] != zz[None, :, :])
+        conflicts[rows] = (support[rows, None, :] & support[None, :, :] & differ).any(axis=2)
+    #
+    return conflicts
+#
+
+##-- DSATUR colouring of a graph given by its boolean adjacency matrix
+def dsatur_colouring(adjacency):
+    """
+    Returns the colour (0, 1, ...) of every vertex. At each step the
+    uncoloured vertex with the largest saturation (number of distinct colours
+    among its neighbours), then the largest degree, then the lowest index,
+    gets the lowest colour not used by its neighbours.
+
+    """
+    adjacency = np.asarray(adjacency, dtype=bool)
+    nn = len(adjacency)
+    colours = np.full(nn, -1, dtype=np.int64)
+    degree = adjacency.sum(axis=1)
+    saturation = np.zeros(nn, dtype=np.int64)
+    ##-- seen[v, c] is True if a neighbour of v has colour c
+    seen = np.zeros((nn, 1), dtype=bool)
+    ncolours = 0
+    for _ in range(nn):
+        key = np.where(colours < 0, saturation*(nn + 1) + degree, -1)
+        vv = int(np.argmax(key))
+        free = np.nonzero(~seen[vv, :ncolours])[0]
+        cc = int(free[0]) if len(free) else ncolours
+        if cc == ncolours:
+            ncolours += 1
+            if ncolours > seen.shape[1]:
+                seen = np.hstack([seen, np.zeros_like(seen)])
+            #
+        #
+        colours[vv] = cc
+        new = adjacency[vv] & ~seen[:, cc]
+        saturation[new] += 1
+        seen[new, cc] = True
+    #
+    return colours
+#
+
+##-- partition Pauli strings into qubit-wise commuting settings
+def group_settings(paulis):
+    """
+    Returns a list of settings, one dictionary per setting with the local
+    basis of every qubit ("setting", a string of X, Y and Z, with Z on the
+    qubits where no member acts) and the indices of the strings measured in
+    it ("members"). paulis are strings of I (or 1), X, Y and Z.
+
+    """
+    xx, zz, _ = stabilizer_sets.paulis_from_strings(paulis)
+    colours = dsatur_colouring(conflict_graph(xx, zz))
+    groups = []
+    for cc in range(colours.max() + 1 if len(colours) else 0):
+        members = np.nonzero(colours == cc)[0]
+        setting = stabilizer_sets.paulis_to_strings(xx[members].any(axis=0)[None], zz[members].any(axis=0)[None],
+                                                    identity="Z")[0]
+        groups.append({"setting": setting, "members": members.tolist()})
+    #
+    return groups
+#
+
+##-- the setting in which each Pauli string is measured
+def pauli_settings(paulis):
+    settings = [None]*len(paulis)
+    for group in group_settings(paulis):
+        for kk in group["members"]:
+            settings[kk] = group["setting"]
+        #
+    #
+    return settings
+#
+
+##-- the settings of the node generators and edge products of a graph state
+def witness_settings(graph):
+    return group_settings(witness_sampling.node_pauli_strings(graph) + witness_sampling.edge_pauli_strings(graph))
+#
+
+###
+#   Evaluation
+###
+##-- expectation values of Pauli strings, rotating the state once per setting
+def grouped_expectation_values(rho, paulis, groups=None, chunk=256):
+    """
+    Returns the expectation values of the Pauli strings on the register state
+    rho (density matrix or state vector, big-endian as in
+    witness_sampling.register_state), as witness_sampling.expectation_values,
+    with one rotated diagonal per setting of groups (by default
+    group_settings(paulis)) and chunk strings read at a time from it.
+
+    """
+    xx, zz, _ = stabilizer_sets.paulis_from_strings(paulis)
+    strings = stabilizer_sets.paulis_to_strings(xx, zz)
+    if groups is None:
+        groups = group_settings(strings)
+    #
+    values = np.zeros(len(strings))
+    for group in groups:
+        probs = witness_sampling.rotated_diagonal(rho, group["setting"])
+        members = group["members"]
+        for start in range(0, len(members), chunk):
+            block = members[start:start + chunk]
+            values[block] = witness_sampling.estimate_from_counts(probs, [strings[kk] for kk in block])
+        #
+    #
+    return values
+#
+
+##-- signed expectation values of every operator of a loaded stabilizer set
+def stabilizer_set_values(rho, stabs, groups=None):
+    """
+    Returns the signed expectation values of the operators of a set loaded
+    with stabilizer_sets.load, as stabilizer_sets.stabilizer_expectation_values,
+    rotating the register state once per qubit-wise commuting setting.
+
+    """
+    strings = stabilizer_sets.paulis_to_strings(*stabilizer_sets.stabilizer_bits(stabs))
+    return stabilizer_sets.stabilizer_signs(stabs)*grouped_expectation_values(rho, strings, groups)
+#
@@ -0,0 +1,229 @@
+###
+#   This module is a headless generate -> evaluate pipeline. It builds the noisy
+#   generation circuits, simulates them, traces out the storages and evaluates
+#   the stabilizer expectation values needed for the witness.
+#
+#   usage: python -m state_gen_stuff.pipeline spec.json -o output_dir -j 4
+#
+#   The job spec is a json file of the form
+#   {"groups": [{"topology": "1D", "sizes": [4, 5, 6],
+#                "wait_ts": [0.125, 0.125, 0.125, 0.075, 0.205],
+#                "coherence_times": [[27, 22, 16, 12]],
+#                "noise_params": [[0.01, 0.0], [0.0, 0.0]],
+#                "precision": "double"}]}
+#   with one coherence-time tuple per storage and an optional precision
+#   ("double" or "single"). Each group expands into one job per size and
+#   noise-parameter point. Every job writes its results into its own folder,
+#   so an interrupted run resumes where it stopped. A failing job does not
+#   stop the others; its error is recorded in manifest.json and running the
+#   spec again retries only the jobs without results.
+###
+
+### loading some moduels
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from . import checkpoint
+from . import graph_state_gen_circuits as gsg
+from . import precision
+from . import qutrit_utils
+from . import target_graphs
+from . import witness_sampling
+
+###
+#   Supported topologies
+###
+##-- builder of the circuit and of the target graph for each topology
+TOPOLOGIES = {
+    "1D": (gsg.noisy_cluster_state_1D, target_graphs.build_1D_cluster_state_graph),
+    "2D": (gsg.noisy_cluster_state_2D, lambda nn: target_graphs.build_2D_cluster_state_graph(nn, 2)),
+    "2D_3S": (gsg.noisy_cluster_state_2D_3S, lambda nn: target_graphs.build_2D_cluster_state_graph(nn, 3)),
+    "ring": (gsg.noisy_ring_cluster_state, target_graphs.build_ring_graph),
+    "tree": (gsg.noisy_tree_graph_state, target_graphs.build_tree_graph),
+}
+
+###
+#   Jobs
+###
+##-- the canonical form of a job, so equal parameters (e.g., 1 and 1.0) give the same name
+def normalize_job(job):
+    if job["topology"] not in TOPOLOGIES:
+        raise ValueError("unknown topology %s" % job["topology"])
+    #
+    return {
+        "topology": job["topology"],
+        "size": int(job["size"]),
+        "wait_ts": [float(tt) for tt in job["wait_ts"]],
+        "coherence_times": [[float(tt) for tt in ct] for ct in job["coherence_times"]],
+        "noise_params": [float(pp) for pp in job["noise_params"]],
+        "precision": job.get("precision", "double"),
+    }
+#
+
+##-- expand a job spec into the list of jobs
+def expand_spec(spec):
+    jobs = []
+    for group in spec["groups"]:
+        if group["topology"] not in TOPOLOGIES:
+            raise ValueError("unknown topology %s" % group["topology"])
+        #
+        for size in group["sizes"]:
+            for noise_params in group["noise_params"]:
+                job = {
+                    "topology": group["topology"],
+                    "size": size,
+                    "wait_ts": group["wait_ts"],
+                    "coherence_times": group["coherence_times"],
+                    "noise_params": noise_params,
+                    "precision": group.get("precision", "double"),
+                }
+                jobs.append(normalize_job(job))
+            #
+        #
+    #
+    return jobs
+#
+
+##-- a unique and readable name for a job
+def job_name(job):
+    digest = hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()[:10]
+    return "%s_%d_%s" % (job["topology"], job["size"], digest)
+#
+
+##-- write a file atomically, so a crash never leaves a partial checkpoint
+def _atomic_save(path, writer):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as ff:
+        writer(ff)
+    #
+    os.replace(tmp, path)
+#
+
+##-- run a single job, reusing the checkpoints found in its folder
+def run_job(job, outdir, witness=witness_sampling.toth_guhne_witness):
+    """
+    Runs the three stages of a job, each one checkpointed in the folder of
+    the job: the simulation of the circuit (with periodic mid-circuit
+    checkpoints, see checkpoint.py), the trace over the storages (rho.npy)
+    and the evaluation of the expectation values (results.json). witness is
+    a module-level function of the node and edge values (it is sent to the
+    worker processes).
+
+    """
+    jobdir = os.path.join(outdir, job_name(job))
+    os.makedirs(jobdir, exist_ok=True)
+    rho_path = os.path.join(jobdir, "rho.npy")
+    results_path = os.path.join(jobdir, "results.json")
+
+    if os.path.exists(results_path):
+        with open(results_path) as ff:
+            return json.load(ff)
+        #
+    #
+
+    builder, graph_builder = TOPOLOGIES[job["topology"]]
+
+    ##-- simulate and trace out the storages
+    if os.path.exists(rho_path):
+        rho = np.load(rho_path)
+    else:
+        args = (job["size"], job["wait_ts"], *job["coherence_times"], job["noise_params"])
+        with qutrit_utils.precision_mode(job["precision"]):
+            circuit = builder(*args)
+        #
+        ckpt_dir = os.path.join(jobdir, "checkpoint")
+        final_rho, qid_shape = checkpoint.simulate_with_checkpoints(circuit, ckpt_dir, precision=job["precision"],
+                                                                    save_final=False)
+        rho = witness_sampling.register_state(final_rho, qid_shape)
+        _atomic_save(rho_path, lambda ff: np.save(ff, rho))
+        shutil.rmtree(ckpt_dir, ignore_errors=True)
+    #
+
+    ##-- evaluate the stabilizers involved in the witness
+    graph = graph_builder(job["size"])
+    nodes = witness_sampling.node_pauli_strings(graph)
+    edges = witness_sampling.edge_pauli_strings(graph)
+    node_values = witness_sampling.expectation_values(rho, nodes)
+    edge_values = witness_sampling.expectation_values(rho, edges)
+
+    results = {"job": job}
+    results.update(witness_sampling.witness_result(nodes, edges, node_values, edge_values, witness))
+    results["trace_drift"] = precision.trace_drift(rho)
+    results["hermiticity_drift"] = precision.hermiticity_drift(rho)
+    _atomic_save(results_path, lambda ff: ff.write(json.dumps(results, indent=1).encode()))
+    return results
+#
+
+##-- run all the jobs of a spec across a pool of workers
+def run_pipeline(spec, outdir, workers=1, witness=witness_sampling.toth_guhne_witness):
+    """
+    Runs every job of the spec and writes a summary.csv with one row per
+    completed job and a manifest.json with the status ("done" or "failed")
+    and the error of every job. Jobs already completed in outdir are not
+    recomputed, so running a spec again retries only the failed jobs.
+    Returns the results of the completed jobs.
+
+    """
+    os.makedirs(outdir, exist_ok=True)
+    jobs = expand_spec(spec)
+    results = {}
+    manifest = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job, outdir, witness): job_name(job) for job in jobs}
+        for ii, future in enumerate(as_completed(futures)):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as err:
+                manifest[name] = {"status": "failed", "error": "%s: %s" % (type(err).__name__, err)}
+                print("Job %s, step %d of %d, failed: %s -->>" % (name, ii+1, len(jobs), manifest[name]["error"]))
+                continue
+            #
+            manifest[name] = {"status": "done", "error": None}
+            print("Job %s, step %d of %d, completed -->>" % (name, ii+1, len(jobs)))
+        #
+    #
+
+    manifest = {job_name(job): dict(manifest[job_name(job)], job=job) for job in jobs}
+    _atomic_save(os.path.join(outdir, "manifest.json"), lambda ff: ff.write(json.dumps(manifest, indent=1).encode()))
+
+    with open(os.path.join(outdir, "summary.csv"), "w", newline="") as ff:
+        writer = csv.writer(ff)
+        writer.writerow(["job", "topology", "size", "noise_params", "witness"])
+        for job in jobs:
+            name = job_name(job)
+            if name not in results:
+                continue
+            #
+            writer.writerow([name, job["topology"], job["size"], json.dumps(job["noise_params"]), results[name]["witness"]])
+        #
+    #
+    return results
+#
+
+###
+#   Command line entry point
+###
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate and evaluate noisy graph states.")
+    parser.add_argument("spec", help="json file with the job spec")
+    parser.add_argument("-o", "--outdir", default="pipeline_output", help="folder for the checkpoints and results")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as ff:
+        spec = json.load(ff)
+    #
+    run_pipeline(spec, args.outdir, args.workers)
+#
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+###
+#   This module runs the density-matrix simulations of the generation circuits
+#   in single (complex64) or double (complex128) precision, and reports the
+#   numerical drift of the single-precision results.
+###
+
+### loading some moduels
+import numpy as np
+
+import cirq
+
+from . import lightcone
+from . import qutrit_utils
+from . import witness_sampling
+
+###
+#   Simulation with a given precision
+###
+##-- simulate a circuit with the simulator dtype matching the precision
+def simulate_density_matrix(circuit, precision="double", lazy=False):
+    """
+    Returns the final density matrix of the circuit and the qid shape of the
+    register, using a simulator with the dtype of the given precision. The
+    circuit should be built with the same precision (see
+    qutrit_utils.precision_mode) so the gate matrices and Kraus operators are
+    not upcast during the simulation. With lazy, each photon is added to the
+    simulated state only when it is first touched (see lightcone.simulate_lazy).
+
+    """
+    if lazy:
+        rho, qid_shape = lightcone.simulate_lazy(circuit)
+        return rho.astype(qutrit_utils.PRECISIONS[precision], copy=False), qid_shape
+    #
+    qubits = sorted(circuit.all_qubits())
+    dsim = cirq.DensityMatrixSimulator(dtype=qutrit_utils.PRECISIONS[precision])
+    rho = dsim.simulate(circuit, qubit_order=qubits).final_density_matrix
+    return rho, cirq.qid_shape(qubits)
+#
+
+##-- build and simulate one of the circuits of graph_state_gen_circuits
+def simulate_builder(builder, args, precision="double", lazy=False):
+    with qutrit_utils.precision_mode(precision):
+        circuit = builder(*args)
+    #
+    return simulate_density_matrix(circuit, precision, lazy)
+#
+
+###
+#   Error reporting
+###
+##-- deviation of the trace from one
+def trace_drift(rho):
+    return float(abs(np.trace(rho) - 1))
+#
+
+##-- largest element of rho - rho^dagger
+def hermiticity_drift(rho):
+    return float(np.max(np.abs(rho - rho.conj().T)))
+#
+
+##-- compare a single-precision run against a double-precision one
+def precision_report(builder, args, graph=None):
+    """
+    Simulates builder(*args) in double and in single precision and returns a
+    dictionary with the memory of both density matrices, the trace and
+    Hermiticity drift of both runs, and the largest deviation of the density
+    matrix elements. If the target graph is given, it also reports the largest
+    deviation of the node and edge stabilizer expectation values on the
+    register.
+
+    """
+    rho_d, qid_shape = simulate_builder(builder, args, "double")
+    rho_s, _ = simulate_builder(builder, args, "single")
+
+    report = {
+        "nbytes_double": rho_d.nbytes,
+        "nbytes_single": rho_s.nbytes,
+        "trace_drift_double": trace_drift(rho_d),
+        "trace_drift_single": trace_drift(rho_s),
+        "hermiticity_drift_double": hermiticity_drift(rho_d),
+        "hermiticity_drift_single": hermiticity_drift(rho_s),
+        "max_element_deviation": float(np.max(np.abs(rho_s - rho_d))),
+    }
+
+    if graph is not None:
+        paulis = witness_sampling.node_pauli_strings(graph) + witness_sampling.edge_pauli_strings(graph)
+        values_d = witness_sampling.expectation_values(witness_sampling.register_state(rho_d, qid_shape), paulis)
+        values_s = witness_sampling.expectation_values(witness_sampling.register_state(rho_s, qid_shape), paulis)
+        report["max_stabilizer_deviation"] = float(np.max(np.abs(values_s - values_d)))
+    #
+    return report
+#
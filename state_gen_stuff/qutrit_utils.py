@@ -5,19 +5,60 @@
 
 ### loading some moduels
 import numpy as np
-from scipy.linalg import expm
-from math import sqrt
 
 import itertools
+from contextlib import contextmanager
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
 
 import cirq
 from cirq import protocols
 
+from . import gate_matrices
+from .gate_matrices import PRECISIONS, pad, ppd
+
+###
+#   Numerical precision
+###
+##-- the precision of the gates and channels, see gate_matrices.PRECISIONS
+_precision = "double"
+
+def set_precision(precision):
+    """
+    Sets the precision ("double" or "single") of the matrices of the gates
+    and channels created from now on.
+
+    """
+    global _precision
+    if precision not in PRECISIONS:
+        raise ValueError("precision must be one of %s" % list(PRECISIONS))
+    #
+    _precision = precision
+#
+
+def get_dtype():
+    return PRECISIONS[_precision]
+#
+
+##-- build circuits with a given precision, e.g., with precision_mode("single"): ...
+@contextmanager
+def precision_mode(precision):
+    previous = _precision
+    set_precision(precision)
+    try:
+        yield PRECISIONS[precision]
+    finally:
+        set_precision(previous)
+    #
+#
+
 ###
 #   Qutrit functionalities
 ###
+##-- the namespace of the gates and channels in Cirq's json serialization
+JSON_NAMESPACE = "state_gen_stuff"
+
 ##-- A hadamard for the first two levels of a qutrit
+@cirq.value_equality
 class Q3_H(cirq.Gate):
     """
     A gate that implements a Hadamard between the first two levels of a qutrit.
@@ -26,6 +67,7 @@ class Q3_H(cirq.Gate):
     def __init__(self, angle):
         super(Q3_H, self)
         self.angle = angle
+        self.dtype = get_dtype()
 
     def _qid_shape_(self):
         # By implementing this method this gate implements the
@@ -37,15 +79,57 @@ class Q3_H(cirq.Gate):
     def _unitary_(self):
         # Since the gate acts on three level systems it has a unitary
         # effect which is a three by three unitary matrix.
-        return np.array([[1j*np.cos(0.5*self.angle) + np.sin(0.5*self.angle)/np.sqrt(2), np.sin(0.5*self.angle)/np.sqrt(2), 0],
-                         [np.sin(0.5*self.angle)/np.sqrt(2), 1j*np.cos(0.5*self.angle) - np.sin(0.5*self.angle)/np.sqrt(2), 0],
-                         [0, 0, 1]])
+        return gate_matrices.h_matrix(self.angle, self.dtype)
 
     def _circuit_diagram_info_(self, args):
         return '[H]'
+
+    def _value_equality_values_(self):
+        return (self.angle,)
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['angle'])
+#
+
+##-- A phase on the |e> level of a qutrit
+@cirq.value_equality
+class Q3_S(cirq.Gate):
+    """
+    A gate that implements a phase gate diag(1, exp(i angle)) between the first
+    two levels of a qutrit (the S gate for angle pi/2).
+
+    """
+    def __init__(self, angle):
+        super(Q3_S, self)
+        self.angle = angle
+        self.dtype = get_dtype()
+
+    def _qid_shape_(self):
+        return (3,)
+
+    def _unitary_(self):
+        return gate_matrices.s_matrix(self.angle, self.dtype)
+
+    def _circuit_diagram_info_(self, args):
+        return '[S]'
+
+    def _value_equality_values_(self):
+        return (self.angle,)
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['angle'])
 #
 
 ##-- Pi pulse for the ef transition of the storages
+@cirq.value_equality
 class Q3_PI_ef(cirq.Gate):
     """
     A gate that implements a population transfer between the |e> and |f> levels
@@ -56,6 +140,7 @@ class Q3_PI_ef(cirq.Gate):
     def __init__(self, angle):
         super(Q3_PI_ef, self)
         self.angle = angle
+        self.dtype = get_dtype()
 
     def _qid_shape_(self):
         # By implementing this method this gate implements the
@@ -67,16 +152,24 @@ class Q3_PI_ef(cirq.Gate):
     def _unitary_(self):
         # Since the gate acts on three level systems it has a unitary
         # effect which is a three by three unitary matrix.
-        unitary =  np.array([[1, 0, 0],
-                             [0, -1j*np.cos(0.5*self.angle), np.sin(0.5*self.angle)],
-                             [0, np.sin(0.5*self.angle), -1j*np.cos(0.5*self.angle)]])
-        return unitary
+        return gate_matrices.pi_ef_matrix(self.angle, self.dtype)
 
     def _circuit_diagram_info_(self, args):
         return r"[pi_ef]"
+
+    def _value_equality_values_(self):
+        return (self.angle,)
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['angle'])
 #
 
 ##-- A CNOT between a qutrit and a qubit. Use the qubit subspace of the qutrit as control
+@cirq.value_equality
 class Q3_CNOT(cirq.Gate):
     """
     A gate that implements a population swap between the levels |f0> and |e1> of
@@ -89,6 +182,7 @@ class Q3_CNOT(cirq.Gate):
         super(Q3_CNOT, self)
         self.leakage_rate = leakage_rate
         self.leakage_phase = leakage_phase
+        self.dtype = get_dtype()
 
     def _qid_shape_(self):
         # By implementing this method this gate implements the
@@ -100,35 +194,34 @@ class Q3_CNOT(cirq.Gate):
     def _unitary_(self):
         # Since the gate acts on three level systems it has a unitary
         # effect which is a three by three unitary matrix.
-        cnot = np.diag(np.ones(6, dtype = complex))
-        cnot[3][3] = 0
-        cnot[4][4] = 0
-        cnot[3][4] = 1
-        cnot[4][3] = 1
+        return gate_matrices.cnot_matrix(self.leakage_rate, self.leakage_phase, self.dtype)
 
-        leakage = 4*self.leakage_rate
-
-        generator = np.zeros((6,6), dtype = complex)
-        generator[3][4] = -1j * np.arcsin(sqrt(leakage)) * np.exp(1j * self.leakage_phase)
-        generator[4][3] = 1j * np.arcsin(sqrt(leakage)) * np.exp(-1j * self.leakage_phase)
-
-        noisy_unitary = expm(1j * generator)
+    def _circuit_diagram_info_(self, args: 'cirq.CircuitDiagramInfoArgs') -> 'cirq.CircuitDiagramInfo':
+        return protocols.CircuitDiagramInfo(wire_symbols=('[CX_Q3_Q2]', '@'))
 
-        cnot_unitary = cnot @ noisy_unitary
+    def _value_equality_values_(self):
+        return (self.leakage_rate, self.leakage_phase)
 
-        return cnot_unitary
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
 
-    def _circuit_diagram_info_(self, args: 'cirq.CircuitDiagramInfoArgs') -> 'cirq.CircuitDiagramInfo':
-        return protocols.CircuitDiagramInfo(wire_symbols=('[CX_Q3_Q2]', '@'))
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['leakage_rate', 'leakage_phase'])
 #
 
 ##-- A SWAP between the qubit subspace of a qutrit and a qubit
+@cirq.value_equality
 class Q3_SWAP(cirq.Gate):
     """
     A gate that implements a swap between the qubit subspace of a qutrit and a qubit.
 
     """
 
+    def __init__(self):
+        super(Q3_SWAP, self)
+        self.dtype = get_dtype()
+
     def _qid_shape_(self):
         # By implementing this method this gate implements the
         # cirq.qid_shape protocol and will return the tuple (3,)
@@ -139,18 +232,24 @@ class Q3_SWAP(cirq.Gate):
     def _unitary_(self):
         # Since the gate acts on three level systems it has a unitary
         # effect which is a three by three unitary matrix.
-        return np.array([[1, 0, 0, 0, 0, 0],
-                         [0, 0, 1, 0, 0, 0],
-                         [0, 1, 0, 0, 0, 0],
-                         [0, 0, 0, 1, 0, 0],
-                         [0, 0, 0, 0, 1, 0],
-                         [0, 0, 0, 0, 0, 1]])
+        return gate_matrices.swap_matrix(self.dtype)
 
     def _circuit_diagram_info_(self, args: 'cirq.CircuitDiagramInfoArgs') -> 'cirq.CircuitDiagramInfo':
         return protocols.CircuitDiagramInfo(wire_symbols=('X', 'X'))
+
+    def _value_equality_values_(self):
+        return ()
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, [])
 #
 
 ##-- A CZ between two qutrits
+@cirq.value_equality
 class Q3_CZ(cirq.Gate):
     """
     A gate that implements a CPHASE between two qutrits exploiting the
@@ -162,6 +261,7 @@ class Q3_CZ(cirq.Gate):
         self.angle = angle
         self.leakage_rate = leakage_rate
         self.leakage_phase = leakage_phase
+        self.dtype = get_dtype()
 
     def _qid_shape_(self):
         # By implementing this method this gate implements the
@@ -173,29 +273,24 @@ class Q3_CZ(cirq.Gate):
     def _unitary_(self):
         # Since the gate acts on three level systems it has a unitary
         # effect which is a three by three unitary matrix.
-        phases = np.zeros(9, dtype = complex)
-        phases[2] = -self.angle
-        phases[4] = self.angle
-        ideal_unitary = expm(1j * np.diag(phases))
-
+        return gate_matrices.cz_matrix(self.angle, self.leakage_rate, self.leakage_phase, self.dtype)
 
-        leakage = 4*self.leakage_rate
-
-        generator = np.zeros((9,9), dtype = complex)
-        generator[2][4] = 1j * np.arcsin(sqrt(leakage)) * np.exp(1j * self.leakage_phase)
-        generator[4][2] = -1j * np.arcsin(sqrt(leakage)) * np.exp(-1j * self.leakage_phase)
-
-        noisy_unitary = expm(1j * generator)
+    def _circuit_diagram_info_(self, args: 'cirq.CircuitDiagramInfoArgs') -> 'cirq.CircuitDiagramInfo':
+            return protocols.CircuitDiagramInfo(wire_symbols=('[Q3_CZ]', '@'))
 
-        cz_unitary = ideal_unitary @ noisy_unitary
+    def _value_equality_values_(self):
+        return (self.angle, self.leakage_rate, self.leakage_phase)
 
-        return cz_unitary
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
 
-    def _circuit_diagram_info_(self, args: 'cirq.CircuitDiagramInfoArgs') -> 'cirq.CircuitDiagramInfo':
-            return protocols.CircuitDiagramInfo(wire_symbols=('[Q3_CZ]', '@'))
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['angle', 'leakage_rate', 'leakage_phase'])
 #
 
 ##-- An amplitude damping channel for qutrits
+@cirq.value_equality
 class Q3_AmplitudeDampingChannel(cirq.Gate):
 
     def __init__(self, pro1: float, pro2: float) -> None:
@@ -208,6 +303,7 @@ class Q3_AmplitudeDampingChannel(cirq.Gate):
         """
         self.pro1 = pro1
         self.pro2 = pro2
+        self.dtype = get_dtype()
     #
 
     def _qid_shape_(self):
@@ -218,19 +314,27 @@ class Q3_AmplitudeDampingChannel(cirq.Gate):
         return 1
 
     def _kraus_(self) -> Iterable[np.ndarray]:
-        return (
-            np.array([[0, np.sqrt(self.pro1), 0], [0, 0, 0], [0, 0, 0]]),    # decay |e) -> |g)
-        np.array([[0, 0, 0], [0, 0, np.sqrt(self.pro2)], [0, 0, 0]]),    # decay |f) -> |e)
-        np.array([[1, 0, 0], [0, np.sqrt(1-self.pro1), 0], [0, 0, np.sqrt(1-self.pro2)]])
-        )
+        # decay |e) -> |g), decay |f) -> |e), and no decay
+        return tuple(gate_matrices.amplitude_damping_kraus(self.pro1, self.pro2, self.dtype))
 
     def _has_kraus_(self) -> bool:
         return True
     def _circuit_diagram_info_(self, args):
         return '[Q3_AD]'
+
+    def _value_equality_values_(self):
+        return (self.pro1, self.pro2)
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['pro1', 'pro2'])
 #
 
 ##-- A phase damping channel for qutrits
+@cirq.value_equality
 class Q3_PhaseDampingChannel(cirq.Gate):
 
     def __init__(self, pro1: float, pro2: float) -> None:
@@ -243,6 +347,7 @@ class Q3_PhaseDampingChannel(cirq.Gate):
         """
         self.pro1 = pro1
         self.pro2 = pro2
+        self.dtype = get_dtype()
     #
 
     def _qid_shape_(self):
@@ -253,26 +358,83 @@ class Q3_PhaseDampingChannel(cirq.Gate):
         return 1
 
     def _kraus_(self) -> Iterable[np.ndarray]:
-        return (
-            np.array([[0, 0, 0], [0, np.sqrt(self.pro1), 0], [0, 0, 0]]),
-            np.array([[0, 0, 0], [0, 0, 0], [0, 0, np.sqrt(self.pro2)]]),
-            np.array([[1, 0, 0], [0, np.sqrt(1-self.pro1), 0], [0, 0, np.sqrt(1-self.pro2)]])
-        )
+        return tuple(gate_matrices.phase_damping_kraus(self.pro1, self.pro2, self.dtype))
 
     def _has_kraus_(self) -> bool:
         return True
     def _circuit_diagram_info_(self, args):
         return '[Q3_PD]'
+
+    def _value_equality_values_(self):
+        return (self.pro1, self.pro2)
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return cirq.obj_to_dict_helper(self, ['pro1', 'pro2'])
+#
+
+##-- A single-qutrit channel given by its superoperator
+@cirq.value_equality
+class Q3_SuperoperatorChannel(cirq.Gate):
+    """
+    A channel on a single qudit given by its superoperator, acting on the
+    row-major vectorization of the density matrix (see
+    gate_matrices.superoperator). It is applied to the density matrix in a
+    single pass, and is used to fuse runs of single-qutrit gates and channels.
+    dtype is the precision of its Kraus operators, by default the current one.
+
+    """
+
+    def __init__(self, superoperator, dtype=None):
+        self.superoperator = np.asarray(superoperator)
+        self.dimension = int(round(np.sqrt(self.superoperator.shape[0])))
+        self.dtype = get_dtype() if dtype is None else np.dtype(dtype)
+    #
+
+    def _qid_shape_(self):
+        return (self.dimension,)
+    #
+
+    def _num_qubits_(self) -> int:
+        return 1
+
+    def _apply_channel_(self, args: 'cirq.ApplyChannelArgs'):
+        dim = self.dimension
+        superop = self.superoperator.reshape(dim, dim, dim, dim).astype(args.target_tensor.dtype)
+        return cirq.linalg.targeted_left_multiply(superop, args.target_tensor,
+                                                  [args.left_axes[0], args.right_axes[0]],
+                                                  out=args.out_buffer)
+
+    def _kraus_(self) -> Iterable[np.ndarray]:
+        return tuple(gate_matrices.superoperator_kraus(self.superoperator, dtype = self.dtype))
+
+    def _has_kraus_(self) -> bool:
+        return True
+    def _circuit_diagram_info_(self, args):
+        return '[Q3_SUPEROP]'
+
+    def _value_equality_values_(self):
+        return tuple(self.superoperator.ravel().tolist())
+
+    @classmethod
+    def _json_namespace_(cls):
+        return JSON_NAMESPACE
+
+    def _json_dict_(self):
+        return {"real": self.superoperator.real.tolist(), "imag": self.superoperator.imag.tolist()}
+
+    @classmethod
+    def _from_json_dict_(cls, real, imag, **kwargs):
+        return cls(np.array(real) + 1j*np.array(imag))
 #
 
 ###
 #    Some other utilities
 ###
-##-- amplitude and phase dmaping probs
-def pad(t, T):
-    return 1-np.exp(-t/T)
-def ppd(t, T1, T2):
-    return 1-np.exp(t/T1)*np.exp(-2*t/T2)
+##-- amplitude and phase dmaping probs, pad and ppd, live in gate_matrices
 
 ##-- defining a damping during idle time
 def Q3_idle_time(time, coherence_times, qubit, circuit: cirq.Circuit):
@@ -286,3 +448,30 @@ def Q3_idle_time(time, coherence_times, qubit, circuit: cirq.Circuit):
     circuit.append(Q3_AmplitudeDampingChannel(pad_e, pad_f).on(qubit))
     circuit.append(Q3_PhaseDampingChannel(ppd_e, ppd_f).on(qubit))
 #
+
+###
+#    Serialization
+###
+##-- resolver to read the gates and channels back with cirq.read_json
+def json_resolver(cirq_type):
+    """
+    Returns the class of a serialized gate or channel of this module, or None.
+    Use as cirq.read_json(..., resolvers=[qutrit_utils.json_resolver, *cirq.DEFAULT_RESOLVERS]).
+
+    """
+    prefix = JSON_NAMESPACE + "."
+    if not cirq_type.startswith(prefix):
+        return None
+    #
+    return {
+        "Q3_H": Q3_H,
+        "Q3_S": Q3_S,
+        "Q3_PI_ef": Q3_PI_ef,
+        "Q3_CNOT": Q3_CNOT,
+        "Q3_SWAP": Q3_SWAP,
+        "Q3_CZ": Q3_CZ,
+        "Q3_AmplitudeDampingChannel": Q3_AmplitudeDampingChannel,
+        "Q3_PhaseDampingChannel": Q3_PhaseDampingChannel,
+        "Q3_SuperoperatorChannel": Q3_SuperoperatorChannel,
+    }.get(cirq_type[len(prefix):])
+#
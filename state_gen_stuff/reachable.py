@@ -0,0 +1,178 @@
+###
+#   This module simulates a generation circuit on the reachable subspace of
+#   the register. The density matrix is only non-zero between computational
+#   basis states (configurations of the storage levels and photon bits) that
+#   the circuit can reach: the photons stay in |0> until their emission, and
+#   the |f> level of a storage is only reached through the pi_ef pulse, the
+#   leakage of the CNOT and CZ, and left again through their population swap.
+#
+#   The reachable set is propagated with the sparsity pattern of the Kraus
+#   operators of each gate and channel (a local level a can go to b if some
+#   Kraus operator has a non-zero <b|K|a>), and configurations whose
+#   population is exactly zero are dropped. The state is stored as the dense
+#   block of rho on the reachable set, and each operation is applied as a
+#   gather/scatter of that block for every non-zero local matrix element, so
+#   the work is proportional to the size of the block, not to (3^k 2^N)^2.
+###
+
+### loading some moduels
+import numpy as np
+
+from . import lightcone
+
+###
+#   Configurations
+###
+##-- mixed-radix strides of a register, big-endian as in Cirq
+def register_strides(qid_shape):
+    strides = np.ones(len(qid_shape), dtype=np.int64)
+    for ii in range(len(qid_shape) - 2, -1, -1):
+        strides[ii] = strides[ii + 1]*qid_shape[ii + 1]
+    #
+    return strides
+#
+
+##-- the level of the qid at position ii in every configuration code
+def qid_levels(codes, qid_shape, ii):
+    return (codes // register_strides(qid_shape)[ii]) % qid_shape[ii]
+#
+
+###
+#   Simulation
+###
+##-- apply one operation to the block of rho on the reachable configurations
+def apply_reachable(codes, rho, kraus, positions, qid_shape, atol=1e-12):
+    """
+    Returns the reachable configurations after the operation and the block of
+    the new density matrix on them. kraus is the stack of Kraus operators of
+    the operation, reshaped to (k, d, d), on the qids at positions.
+
+    """
+    strides = register_strides(qid_shape)
+    ldims = [qid_shape[pp] for pp in positions]
+    lstrides = register_strides(ldims)
+    dloc = int(np.prod(ldims))
+
+    ##-- local level and rest of each configuration, and offset of each local level
+    digits = [(codes // strides[pp]) % qid_shape[pp] for pp in positions]
+    local = sum(dd*ls for dd, ls in zip(digits, lstrides))
+    rest = codes - sum(dd*strides[pp] for dd, pp in zip(digits, positions))
+    offsets = np.array([sum(((bb // ls) % dd)*strides[pp] for ls, dd, pp in zip(lstrides, ldims, positions))
+                        for bb in range(dloc)], dtype=np.int64)
+
+    nonzero = np.abs(kraus) > atol
+    pairs = np.argwhere(nonzero.any(axis=0))
+    sources = {aa: np.nonzero(local == aa)[0] for aa in set(pairs[:, 1].tolist())}
+    new_codes = np.unique(np.concatenate([rest[sources[aa]] + offsets[bb] for bb, aa in pairs]))
+    targets = {(bb, aa): np.searchsorted(new_codes, rest[sources[aa]] + offsets[bb]) for bb, aa in pairs}
+
+    new_rho = np.zeros((len(new_codes), len(new_codes)), dtype=rho.dtype)
+    for kk in range(len(kraus)):
+        ##-- K rho, then (K rho) K^dagger, one local matrix element at a time
+        left = np.zeros((len(new_codes), len(codes)), dtype=rho.dtype)
+        for bb, aa in pairs:
+            if nonzero[kk, bb, aa]:
+                left[targets[bb, aa]] += kraus[kk, bb, aa]*rho[sources[aa]]
+            #
+        #
+        for bb, aa in pairs:
+            if nonzero[kk, bb, aa]:
+                new_rho[:, targets[bb, aa]] += np.conj(kraus[kk, bb, aa])*left[:, sources[aa]]
+            #
+        #
+    #
+
+    ##-- drop the configurations with exactly zero population
+    keep = np.diagonal(new_rho) != 0
+    if not keep.all():
+        new_codes = new_codes[keep]
+        new_rho = new_rho[np.ix_(keep, keep)]
+    #
+    return new_codes, new_rho
+#
+
+##-- run a circuit on the reachable subspace
+def simulate_reachable(circuit, atol=1e-12):
+    """
+    Returns the state, a dictionary with the sorted configuration codes of
+    the reachable basis states ("codes", big-endian mixed-radix indices of
+    the register of sorted qids) and the block of rho on them ("rho"), the
+    qid shape and a report of the sparsity: the final and peak number of
+    reachable configurations against the dimension of the register, the
+    fraction of the density matrix stored at the end and at the peak, and the
+    work of the block updates relative to full density-matrix updates.
+    Kraus matrix elements below atol are treated as zero.
+
+    """
+    schedule = lightcone.circuit_schedule(circuit)
+    qids = schedule["qids"]
+    index = {qq: ii for ii, qq in enumerate(qids)}
+    qid_shape = tuple(qq.dimension for qq in qids)
+    dim = int(np.prod(qid_shape))
+    dtype = np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]])
+
+    codes = np.zeros(1, dtype=np.int64)
+    rho = np.ones((1, 1), dtype=dtype)
+    peak = 1
+    work = 0.0
+    for qubits, kraus in schedule["ops"]:
+        dloc = int(np.prod([qq.dimension for qq in qubits]))
+        new_codes, rho = apply_reachable(codes, rho, kraus.reshape(len(kraus), dloc, dloc),
+                                         [index[qq] for qq in qubits], qid_shape, atol)
+        work += float(len(codes))*len(new_codes)
+        codes = new_codes
+        peak = max(peak, len(codes))
+    #
+    report = {
+        "dimension": dim,
+        "reachable": len(codes),
+        "peak_reachable": peak,
+        "stored_fraction": (len(codes)/dim)**2,
+        "peak_stored_fraction": (peak/dim)**2,
+        "work_fraction": work/(len(schedule["ops"])*float(dim)**2) if schedule["ops"] else 0.0,
+        "nbytes_block": rho.nbytes,
+        "nbytes_full": dim*dim*rho.itemsize,
+    }
+    return {"codes": codes, "rho": rho}, qid_shape, report
+#
+
+###
+#   Evaluation on the block
+###
+##-- the full density matrix of a state (for small registers)
+def to_dense(state, qid_shape):
+    dim = int(np.prod(qid_shape))
+    rho = np.zeros((dim, dim), dtype=state["rho"].dtype)
+    rho[np.ix_(state["codes"], state["codes"])] = state["rho"]
+    return rho
+#
+
+##-- the density matrix of the qubits, tracing out the storages from the block
+def register_state(state, qid_shape):
+    """
+    Returns the reduced density matrix of the qids of dimension 2 (the
+    photons), as witness_sampling.register_state, without building the full
+    density matrix.
+
+    """
+    qid_shape = tuple(qid_shape)
+    codes = state["codes"]
+    photons = [ii for ii in range(len(qid_shape)) if qid_shape[ii] == 2]
+    storages = [ii for ii in range(len(qid_shape)) if qid_shape[ii] != 2]
+
+    photon_codes = np.zeros(len(codes), dtype=np.int64)
+    for ii in photons:
+        photon_codes = 2*photon_codes + qid_levels(codes, qid_shape, ii)
+    #
+    storage_codes = np.zeros(len(codes), dtype=np.int64)
+    for ii in storages:
+        storage_codes = qid_shape[ii]*storage_codes + qid_levels(codes, qid_shape, ii)
+    #
+
+    reduced = np.zeros((2**len(photons), 2**len(photons)), dtype=state["rho"].dtype)
+    for ss in np.unique(storage_codes):
+        rows = np.nonzero(storage_codes == ss)[0]
+        reduced[np.ix_(photon_codes[rows], photon_codes[rows])] += state["rho"][np.ix_(rows, rows)]
+    #
+    return reduced
+#
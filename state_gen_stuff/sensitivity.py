@@ -0,0 +1,273 @@
+###
+#   This module computes the gradient of the stabilizer expectation values and
+#   of the witness with respect to the hardware parameters of the noisy
+#   builders: every entry of wait_ts, of the coherence-time tuples
+#   (T1_e, T2_e, T1_f, T2_f) of each storage, and of noise_params.
+#
+#   The shifted parameter points of a central finite difference are built as
+#   one batch of circuits (lightcone.batched_schedule), which tells, for every
+#   parameter, which operations it changes. The derivatives are then taken in
+#   reverse mode: for each support, one light-cone pass stores the state
+#   before every operation, and one adjoint pass propagates the observables of
+#   the support backwards (Heisenberg picture). At every operation changed by
+#   a shift, the derivative picks up Tr[A (E+(rho) - E-(rho))]/h, with A the
+#   back-propagated observable, rho the stored state and E+/- the channel of
+#   the operation at the two shifted points. The cost is about two light-cone
+#   passes plus two channel applications per changed operation and shift,
+#   instead of 2 x (number of parameters) + 1 light-cone passes.
+###
+
+### loading some moduels
+import numpy as np
+
+from . import lightcone
+from . import pipeline
+from . import witness_sampling
+
+###
+#   Parameters
+###
+##-- names of the wait times and of the noise parameters of each builder
+WAIT_TS_NAMES = {
+    "1D": ("t1", "t2", "t3", "t4", "t5"),
+    "2D": ("t1", "t2", "t3", "t4", "t5", "tsw1", "tsw2"),
+    "2D_3S": ("t1", "t2", "t3", "t4", "t5", "tsw1", "tsw2", "tsw3"),
+    "ring": ("t1", "t2", "t3", "t4", "t5", "tsw1", "tsw2"),
+    "tree": ("t1", "t2", "t3", "t4", "t5", "tsw1", "tsw2"),
+}
+NOISE_PARAMS_NAMES = {
+    "1D": ("l1_cnot", "sq_gamma"),
+    "2D": ("gamma", "l1_cz", "l1_cnot", "sq_gamma"),
+    "2D_3S": ("gamma", "l1_cz", "l1_cnot", "sq_gamma"),
+    "ring": ("gamma", "l1_cz", "l1_cnot", "sq_gamma"),
+    "tree": ("gamma", "l1_cz", "l1_cnot", "sq_gamma"),
+}
+COHERENCE_NAMES = ("T1_e", "T2_e", "T1_f", "T2_f")
+
+##-- parameters that cannot be negative (times and leakage rates)
+NONNEGATIVE = ("l1_cz", "l1_cnot")
+
+##-- the names of the flattened parameters of a topology
+def parameter_names(topology, coherence_times):
+    names = ["wait_ts." + nn for nn in WAIT_TS_NAMES[topology]]
+    for ss in range(len(coherence_times)):
+        names += ["ctimes_s%d.%s" % (ss + 1, nn) for nn in COHERENCE_NAMES]
+    #
+    names += ["noise_params." + nn for nn in NOISE_PARAMS_NAMES[topology]]
+    return names
+#
+
+##-- flatten the builder arguments into one vector, and back
+def flatten_parameters(wait_ts, coherence_times, noise_params):
+    return np.array([*wait_ts, *[tt for ct in coherence_times for tt in ct], *noise_params], dtype=float)
+#
+
+def unflatten_parameters(values, nwait, nstorages):
+    values = [float(vv) for vv in values]
+    wait_ts = values[:nwait]
+    coherence_times = [values[nwait + 4*ss:nwait + 4*ss + 4] for ss in range(nstorages)]
+    noise_params = values[nwait + 4*nstorages:]
+    return wait_ts, coherence_times, noise_params
+#
+
+###
+#   Adjoint light-cone pass
+###
+##-- the Kraus stack of the adjoint channel, A -> sum_k K^dagger A K
+def _adjoint_kraus(kraus):
+    nn = (kraus.ndim - 1)//2
+    return kraus.conj().transpose([0] + list(range(1 + nn, 1 + 2*nn)) + list(range(1, 1 + nn)))
+#
+
+##-- Tr[A_m X_s] for batches of operators A and X stored as density tensors, shape (S, M)
+def _pair(adjoint, tensor, nqids):
+    swapped = tensor.transpose([0] + list(range(1 + nqids, 1 + 2*nqids)) + list(range(1, 1 + nqids)))
+    return np.tensordot(swapped, adjoint, axes=(list(range(1, 1 + 2*nqids)), list(range(1, 1 + 2*nqids)))).real
+#
+
+##-- the points of a batched schedule at which each operation differs from the base point
+def changed_points(schedule):
+    return [[bb for bb in range(1, len(kraus)) if not np.array_equal(kraus[bb], kraus[0])]
+            for _, kraus in schedule["ops"]]
+#
+
+##-- values and derivatives of observables on one support, with one forward and one adjoint pass
+def support_gradient(schedule, support, observables, shifts, changed=None):
+    """
+    Returns the expectation values, shape (M,), of the M observables (an array
+    (M, dim, dim) on the qids of support in sorted order) at the base point 0
+    of a batched schedule, and their derivatives, shape (len(shifts), M), for
+    the shifts (ip, im, h): the derivative along a parameter whose forward and
+    backward points are ip and im, h apart. changed is changed_points(schedule).
+
+    """
+    if changed is None:
+        changed = changed_points(schedule)
+    #
+    support = set(support)
+    dtype = np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]])
+
+    ##-- forward pass at the base point, keeping the state before every changed operation
+    tensor = np.ones((), dtype=dtype)
+    active = []
+    tape = []
+    for kk, (qubits, kraus) in enumerate(schedule["ops"]):
+        nnew = 0
+        for qq in qubits:
+            if qq not in active:
+                tensor = lightcone.allocate_qid(tensor, len(active), qq.dimension)
+                active.append(qq)
+                nnew += 1
+            #
+        #
+        axes = [active.index(qq) for qq in qubits]
+        moved = [ss for ss, (ip, im, _) in enumerate(shifts) if ip in changed[kk] or im in changed[kk]]
+        state = tensor if moved else None
+        tensor = lightcone.apply_kraus(tensor, kraus[0], axes, len(active))
+        traced = []
+        for qq in qubits:
+            if schedule["last"][qq] == kk and qq not in support:
+                traced.append((active.index(qq), qq.dimension, len(active)))
+                tensor = lightcone.trace_qid(tensor, active.index(qq), len(active))
+                active.remove(qq)
+            #
+        #
+        tape.append((nnew, axes, state, moved, traced))
+    #
+    nfinal = 0
+    for qq in sorted(support):
+        if qq not in active:
+            tensor = lightcone.allocate_qid(tensor, len(active), qq.dimension)
+            active.append(qq)
+            nfinal += 1
+        #
+    #
+
+    ##-- the observables in the layout of the final tensor
+    nqids = len(active)
+    order = [active.index(qq) for qq in sorted(support)]
+    inverse = list(np.argsort(order))
+    observables = np.asarray(observables, dtype=dtype)
+    nobs = len(observables)
+    shape = tuple(qq.dimension for qq in sorted(support))
+    adjoint = observables.reshape((nobs,) + shape + shape)
+    adjoint = adjoint.transpose([0] + [1 + ii for ii in inverse] + [1 + nqids + ii for ii in inverse])
+    values = _pair(adjoint, tensor[None], nqids)[0]
+
+    ##-- adjoint pass, undoing every step of the forward pass
+    gradient = np.zeros((len(shifts), nobs))
+    for _ in range(nfinal):
+        adjoint = adjoint[(slice(None),)*nqids + (0,)][(slice(None),)*(2*nqids - 1) + (0,)]
+        nqids -= 1
+    #
+    for kk in range(len(tape) - 1, -1, -1):
+        nnew, axes, state, moved, traced = tape[kk]
+        kraus = schedule["ops"][kk][1]
+        for position, dimension, nbefore in reversed(traced):
+            adjoint = np.moveaxis(np.multiply.outer(adjoint, np.eye(dimension, dtype=dtype)), [-2, -1],
+                                  [1 + position, 1 + nbefore + position])
+            nqids = nbefore
+        #
+        if moved:
+            ##-- the channels of the forward and backward points of every moved shift in one batched application
+            points = [shifts[ss][0] for ss in moved] + [shifts[ss][1] for ss in moved]
+            shifted = lightcone.apply_batched_kraus(np.broadcast_to(state, (len(points),) + state.shape), kraus[points],
+                                                    axes, nqids)
+            steps = np.array([shifts[ss][2] for ss in moved])
+            gradient[moved] += _pair(adjoint, shifted[:len(moved)] - shifted[len(moved):], nqids)/steps[:, None]
+        #
+        adjoint = lightcone.apply_kraus(adjoint, _adjoint_kraus(kraus[0]), axes, nqids, nbatch=1)
+        for _ in range(nnew):
+            adjoint = adjoint[(slice(None),)*nqids + (0,)][(slice(None),)*(2*nqids - 1) + (0,)]
+            nqids -= 1
+        #
+    #
+    return values, gradient
+#
+
+###
+#   Gradients
+###
+##-- the gradient of the node, edge and witness values with one batched pass
+def witness_gradient(topology, nqubits, wait_ts, coherence_times, noise_params, rel_step=1e-4,
+                     witness=witness_sampling.toth_guhne_witness):
+    """
+    Returns the node generators and edge products of the target graph in the
+    notebook format, with an extra "gradient" entry (one row per parameter),
+    the witness and its gradient, and the names of the parameters, for the
+    state prepared by the noisy builder of the topology with nqubits photons.
+
+    The derivatives are central finite differences with step
+    rel_step*max(|p|, 1), taken operation by operation in the adjoint pass
+    (see support_gradient); a difference is one-sided when the backward point
+    of a time or leakage rate would be negative. The gradient of the witness
+    follows from the gradient of the values by the chain rule (a central
+    difference of witness along each row, exact for a linear witness).
+
+    """
+    builder, graph_builder = pipeline.TOPOLOGIES[topology]
+    names = parameter_names(topology, coherence_times)
+    base = flatten_parameters(wait_ts, coherence_times, noise_params)
+    if len(base) != len(names):
+        raise ValueError("expected %d parameters for topology %s, got %d" % (len(names), topology, len(base)))
+    #
+
+    ##-- the base point and the shifted points of every parameter
+    points = [base]
+    shifts = []
+    for ii, name in enumerate(names):
+        step = rel_step*max(abs(base[ii]), 1.0)
+        nonnegative = not name.startswith("noise_params.") or name.split(".")[1] in NONNEGATIVE
+        plus = base.copy()
+        plus[ii] += step
+        points.append(plus)
+        if nonnegative and base[ii] - step < 0:
+            shifts.append((len(points) - 1, 0, step))
+        else:
+            minus = base.copy()
+            minus[ii] -= step
+            points.append(minus)
+            shifts.append((len(points) - 2, len(points) - 1, 2*step))
+        #
+    #
+
+    circuits = []
+    for pp in points:
+        wt, ct, npar = unflatten_parameters(pp, len(wait_ts), len(coherence_times))
+        circuits.append(builder(nqubits, wt, *ct, npar))
+    #
+    schedule = lightcone.batched_schedule(circuits)
+
+    graph = graph_builder(nqubits)
+    nodes = witness_sampling.node_paulis(graph)
+    edges = witness_sampling.edge_paulis(graph)
+    paulis = nodes + edges
+
+    ##-- one forward and one adjoint pass per support, shared by its operators
+    photons = [qq for qq in schedule["qids"] if qq.dimension == 2]
+    changed = changed_points(schedule)
+    supports = {}
+    for kk, pauli in enumerate(paulis):
+        supports.setdefault(tuple(sorted(pauli)), []).append(kk)
+    #
+    values = np.zeros(len(paulis))
+    gradient = np.zeros((len(shifts), len(paulis)))
+    for support, members in supports.items():
+        observables = [witness_sampling.pauli_operator("".join(paulis[kk][nn] for nn in support)) for kk in members]
+        values[members], gradient[:, members] = support_gradient(schedule, [photons[nn] for nn in support],
+                                                                 np.array(observables), shifts, changed)
+    #
+
+    nnodes = len(nodes)
+    eps = rel_step*max(np.abs(values).max(), 1.0)
+    plus = values + eps*gradient
+    minus = values - eps*gradient
+    wgradient = (witness(plus[:, :nnodes], plus[:, nnodes:]) - witness(minus[:, :nnodes], minus[:, nnodes:]))/(2*eps)
+
+    result = witness_sampling.witness_result(nodes, edges, values[:nnodes], values[nnodes:], witness)
+    result["parameters"] = names
+    result["nodes"]["gradient"] = gradient[:, :len(nodes)].tolist()
+    result["edges"]["gradient"] = gradient[:, len(nodes):].tolist()
+    result["witness_gradient"] = wgradient.tolist()
+    return result
+#
@@ -0,0 +1,369 @@
+###
+#   This module is a local asyncio simulation service and its client library.
+#   The server accepts witness and simulation requests for the noisy builders
+#   (the jobs of pipeline.py), coalesces identical requests that are in flight,
+#   serves finished results from a cache shared by every client (the job
+#   folders of pipeline.run_job), and dispatches the work to a pool of worker
+#   processes through a bounded queue. Once max_pending job requests are in
+#   progress the server stops reading new requests from its connections, so
+#   the backpressure reaches the clients instead of the requests piling up in
+#   the server.
+#
+#   usage: python -m state_gen_stuff.service -o cache_dir -j 4 --port 8765
+#
+#   The protocol is one json object per line, e.g.
+#   {"id": 1, "op": "witness", "job": {"topology": "1D", "size": 5,
+#    "wait_ts": [...], "coherence_times": [[27, 22, 16, 12]],
+#    "noise_params": [0.01, 0.0]}}
+#   answered with {"id": 1, "ok": true, "result": {...}}. The ops are
+#   "witness" (the results of pipeline.run_job), "simulate" (the path of the
+#   register density matrix) and "metrics" (queue depth, cache hits,
+#   coalesced requests and latencies).
+#
+#   pipeline.py (and with it Cirq) is only imported by the server when it
+#   handles a job, so the client functions load nothing but the standard
+#   library and NumPy.
+###
+
+### loading some moduels
+import argparse
+import asyncio
+import collections
+import json
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+###
+#   Server
+###
+class SimulationService:
+    """
+    Runs the jobs of pipeline.py for concurrent clients. Every job is keyed by
+    pipeline.job_name, so identical requests share one computation while it
+    is in flight and are served from the cache (in memory, then the job
+    folders in outdir) once it is done. At most max_pending job requests (by
+    default max_queue plus workers, the jobs that can be queued or running)
+    are accepted at a time. The queue, the dispatchers and the request slots
+    belong to the running event loop, so they are made by start (or serve).
+
+    """
+    def __init__(self, outdir, workers=1, max_queue=64, latency_window=1000, max_pending=None):
+        self.outdir = outdir
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_pending = max_queue + workers if max_pending is None else max_pending
+        self.queue = None
+        self.slots = None
+        self.inflight = {}
+        self.cache = {}
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.counters = collections.Counter()
+        self.pool = None
+        self.dispatchers = []
+        os.makedirs(outdir, exist_ok=True)
+    #
+
+    ##-- start the queue, the request slots, the worker pool and the dispatchers, from the running loop
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.dispatchers = [asyncio.ensure_future(self._dispatch()) for _ in range(self.workers)]
+    #
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        #
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.pool.shutdown(wait=True)
+    #
+
+    ##-- take jobs from the queue and run them in the pool
+    async def _dispatch(self):
+        from . import pipeline
+        loop = asyncio.get_running_loop()
+        while True:
+            job, name, future = await self.queue.get()
+            try:
+                result = await loop.run_in_executor(self.pool, pipeline.run_job, job, self.outdir)
+                self.cache[name] = result
+                self.counters["completed"] += 1
+                future.set_result(result)
+            except Exception as exc:
+                self.counters["failed"] += 1
+                future.set_exception(exc)
+            finally:
+                del self.inflight[name]
+                self.queue.task_done()
+            #
+        #
+    #
+
+    ##-- the finished results of a job, from memory or from its folder
+    def _cached(self, name):
+        if name not in self.cache:
+            path = os.path.join(self.outdir, name, "results.json")
+            if not os.path.exists(path):
+                return None
+            #
+            with open(path) as ff:
+                self.cache[name] = json.load(ff)
+            #
+        #
+        return self.cache[name]
+    #
+
+    ##-- the results of a job, computing them at most once
+    async def submit(self, job):
+        from . import pipeline
+        job = pipeline.normalize_job(job)
+        name = pipeline.job_name(job)
+        self.counters["requests"] += 1
+
+        while True:
+            result = self._cached(name)
+            if result is not None:
+                self.counters["cache_hits"] += 1
+                return name, result
+            #
+            if name in self.inflight:
+                self.counters["coalesced"] += 1
+                future = self.inflight[name]
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self.inflight[name] = future
+                try:
+                    ##-- waits here while the queue is full
+                    await self.queue.put((job, name, future))
+                except asyncio.CancelledError:
+                    ##-- never queued, so the requests coalesced on it queue the job again
+                    del self.inflight[name]
+                    future.cancel()
+                    raise
+                #
+            #
+            try:
+                return name, await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                #
+            #
+        #
+    #
+
+    ##-- queue depth, counters and latency statistics
+    def metrics(self):
+        lat = np.array(self.latencies)
+        latency = {"count": len(lat)}
+        if len(lat):
+            latency.update({"mean": float(lat.mean()), "p50": float(np.percentile(lat, 50)),
+                            "p95": float(np.percentile(lat, 95)), "max": float(lat.max())})
+        #
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "pending_capacity": self.max_pending,
+            "in_flight": len(self.inflight),
+            "workers": self.workers,
+            "requests": self.counters["requests"],
+            "cache_hits": self.counters["cache_hits"],
+            "coalesced": self.counters["coalesced"],
+            "completed": self.counters["completed"],
+            "failed": self.counters["failed"],
+            "latency": latency,
+        }
+    #
+
+    ##-- answer one request
+    async def handle_request(self, message):
+        start = time.perf_counter()
+        op = message.get("op")
+        if op == "metrics":
+            return self.metrics()
+        #
+        if op not in ("witness", "simulate"):
+            raise ValueError("unknown op %r" % op)
+        #
+        ##-- failed jobs count in the latencies too
+        try:
+            name, result = await self.submit(message["job"])
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+        #
+        if op == "simulate":
+            return {"job_name": name, "rho_path": os.path.abspath(os.path.join(self.outdir, name, "rho.npy"))}
+        #
+        return result
+    #
+
+    ##-- serve the requests of one connection, concurrently
+    async def handle_connection(self, reader, writer):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(reply):
+            async with lock:
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+            #
+        #
+
+        async def answer(message):
+            try:
+                reply = {"id": message.get("id"), "ok": True, "result": await self.handle_request(message)}
+            except Exception as exc:
+                reply = {"id": message.get("id"), "ok": False, "error": "%s: %s" % (type(exc).__name__, exc)}
+            #
+            await send(reply)
+        #
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                #
+                ##-- a malformed line gets an error reply, the other requests go on
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("a request must be a json object")
+                    #
+                except ValueError as exc:
+                    await send({"id": None, "ok": False, "error": "%s: %s" % (type(exc).__name__, exc)})
+                    continue
+                #
+                ##-- stop reading while max_pending jobs are in progress; metrics are always answered
+                slot = message.get("op") != "metrics"
+                if slot:
+                    await self.slots.acquire()
+                #
+                task = asyncio.ensure_future(answer(message))
+                if slot:
+                    task.add_done_callback(lambda _: self.slots.release())
+                #
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            #
+            await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+        #
+    #
+
+    ##-- listen on host:port until cancelled
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+            #
+        finally:
+            await self.close()
+        #
+    #
+#
+
+###
+#   Client
+###
+class ServiceClient:
+    """
+    Async client of the simulation service. Each request opens its own
+    connection, so concurrent requests from the same client do not wait on
+    each other.
+
+    """
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.host = host
+        self.port = port
+    #
+
+    async def request(self, message):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+        finally:
+            writer.close()
+        #
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        #
+        return reply["result"]
+    #
+
+    async def witness(self, job):
+        return await self.request({"op": "witness", "job": job})
+    #
+
+    async def simulate(self, job):
+        return await self.request({"op": "simulate", "job": job})
+    #
+
+    async def metrics(self):
+        return await self.request({"op": "metrics"})
+    #
+#
+
+##-- blocking request, e.g., from a notebook that already runs an event loop
+def request(message, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("rb") as ff:
+            reply = json.loads(ff.readline())
+        #
+    #
+    if not reply["ok"]:
+        raise RuntimeError(reply["error"])
+    #
+    return reply["result"]
+#
+
+def witness(job, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    return request({"op": "witness", "job": job}, host, port, timeout)
+#
+
+def simulate(job, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    return request({"op": "simulate", "job": job}, host, port, timeout)
+#
+
+def metrics(host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=None):
+    return request({"op": "metrics"}, host, port, timeout)
+#
+
+###
+#   Command line entry point
+###
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local simulation service for noisy graph states.")
+    parser.add_argument("-o", "--outdir", default="service_cache", help="folder for the cached job results")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-queue", type=int, default=64, help="number of queued jobs before requests wait")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="number of job requests in progress before the server stops reading (default: max-queue + workers)")
+    args = parser.parse_args(argv)
+
+    service = SimulationService(args.outdir, args.workers, args.max_queue, max_pending=args.max_pending)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    #
+#
+
+if __name__ == "__main__":
+    main()
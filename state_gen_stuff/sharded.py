@@ -0,0 +1,253 @@
+###
+#   This module runs the density-matrix simulation of a generation circuit on
+#   several local processes. The density tensor (one ket and one bra axis per
+#   qid) lives in a multiprocessing.shared_memory block, laid out with the
+#   ket and bra axes of a few photons first: those leading axes split the
+#   tensor into slabs, and an operation that does not touch the sharded
+#   photons acts on every slab independently, so the worker processes apply
+#   it to disjoint sets of slabs in place, without copying the state.
+#
+#   Consecutive operations that avoid the sharded photons form a segment that
+#   each worker runs on its slabs in one task. When an operation needs a
+#   sharded photon, the tensor is transposed in parallel into a second shared
+#   block, sharding the photons whose next operation is furthest ahead (the
+#   emitted ones are never touched again), so the axes are permuted only a
+#   handful of times per circuit. As in lightcone.simulate_lazy, a qid only
+#   enters the tensor when it is first touched.
+###
+
+### loading some moduels
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import lightcone
+
+###
+#   Shared tensors
+###
+##-- the shared blocks attached by a worker process, by name
+_ATTACHED = {}
+
+##-- the array view of a shared block
+def _shared_array(name, shape, dtype):
+    if name not in _ATTACHED:
+        _ATTACHED[name] = shared_memory.SharedMemory(name=name)
+    #
+    size = int(np.prod(shape))
+    return np.ndarray((size,), dtype=dtype, buffer=_ATTACHED[name].buf).reshape(shape)
+#
+
+##-- apply a stack of Kraus operators with the ket and bra axes anywhere
+def apply_kraus_axes(tensor, kraus, kets, bras):
+    """
+    Returns sum_k K_k rho K_k^dagger for the Kraus operators in kraus, of
+    shape (k, d_1,..,d_n, d_1,..,d_n), acting on the ket axes kets and the
+    bra axes bras of tensor. A single-qid operation is applied as one
+    contraction with its superoperator.
+
+    """
+    nn = len(kets)
+    if nn == 1:
+        nd = tensor.ndim
+        out = list(range(nd))
+        out[kets[0]] = nd
+        out[bras[0]] = nd + 1
+        superop = np.einsum("kab,kcd->acbd", kraus, kraus.conj())
+        return np.einsum(superop, [nd, nd + 1, kets[0], bras[0]], tensor, list(range(nd)), out)
+    #
+    inner = list(range(nn, 2*nn))
+    out = None
+    for kk in kraus:
+        half = np.moveaxis(np.tensordot(kk, tensor, axes=(inner, kets)), list(range(nn)), kets)
+        term = np.moveaxis(np.tensordot(kk.conj(), half, axes=(inner, bras)), list(range(nn)), bras)
+        out = term if out is None else out + term
+    #
+    return out
+#
+
+###
+#   Worker tasks
+###
+##-- run a segment of operations on some slabs of the shared tensor
+def _run_segment(name, shape, dtype, nlead, slabs, ops):
+    flat = _shared_array(name, shape, dtype).reshape((-1,) + tuple(shape[nlead:]))
+    for ss in slabs:
+        slab = flat[ss]
+        for kraus, kets, bras in ops:
+            slab = apply_kraus_axes(slab, kraus, kets, bras)
+        #
+        flat[ss] = slab
+    #
+    return len(slabs)
+#
+
+##-- write some slabs of a transposed copy of the shared tensor
+def _run_transpose(src, src_shape, dst, dst_shape, dtype, nlead, perm, slabs):
+    source = _shared_array(src, src_shape, dtype).transpose(perm)
+    target = _shared_array(dst, dst_shape, dtype).reshape((-1,) + tuple(dst_shape[nlead:]))
+    for ss in slabs:
+        target[ss] = source[np.unravel_index(ss, dst_shape[:nlead])]
+    #
+    return len(slabs)
+#
+
+##-- write some slabs of the tensor with new qids in |0> as its last axes
+def _run_allocate(src, src_shape, dst, dst_shape, dtype, nlead, nnew, slabs):
+    source = _shared_array(src, src_shape, dtype).reshape((-1,) + tuple(src_shape[nlead:]))
+    target = _shared_array(dst, dst_shape, dtype).reshape((-1,) + tuple(dst_shape[nlead:]))
+    for ss in slabs:
+        target[ss] = 0
+        target[ss][(Ellipsis,) + (0,)*(2*nnew)] = source[ss]
+    #
+    return len(slabs)
+#
+
+###
+#   Layouts
+###
+##-- the memory order of the tensor axes, with the sharded qids first
+def _layout(active, sharded, nqids):
+    rest = [ii for ii in sorted(active) if ii not in sharded]
+    return ([ii for ii in sharded] + [nqids + ii for ii in sharded]
+            + rest + [nqids + ii for ii in rest])
+#
+
+##-- the qids whose next operation is furthest ahead
+def _choose_shards(ops, start, candidates, nshards):
+    next_use = {qq: float("inf") for qq in candidates}
+    for kk in range(len(ops) - 1, start - 1, -1):
+        for qq in ops[kk]:
+            if qq in next_use:
+                next_use[qq] = kk
+            #
+        #
+    #
+    ranked = sorted(candidates, key=lambda qq: (-next_use[qq], qq))
+    return sorted(ranked[:nshards])
+#
+
+##-- split the slabs among the workers
+def _chunks(nslabs, nworkers):
+    return [list(range(ww, nslabs, nworkers)) for ww in range(min(nworkers, nslabs))]
+#
+
+###
+#   Simulation
+###
+##-- simulate a circuit with the density tensor sharded across processes
+def simulate_sharded(circuit, workers=None, nshards=None):
+    """
+    Returns the final density matrix of the circuit (qids in sorted order),
+    the qid shape of the register and a report with the number of segments,
+    reshards and allocations, the workers and slabs, and the time spent
+    applying operations and moving the tensor. nshards is the number of
+    sharded photons (4^nshards slabs); by default the smallest number giving
+    at least two slabs per worker.
+
+    """
+    workers = os.cpu_count() if workers is None else workers
+    schedule = lightcone.circuit_schedule(circuit)
+    qids = schedule["qids"]
+    nqids = len(qids)
+    index = {qq: ii for ii, qq in enumerate(qids)}
+    qid_shape = tuple(qq.dimension for qq in qids)
+    dtype = np.dtype(np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]]))
+    dim = int(np.prod(qid_shape))
+
+    photons = [index[qq] for qq in qids if qq.dimension == 2]
+    if nshards is None:
+        nshards = 0
+        while 4**nshards < 2*workers:
+            nshards += 1
+        #
+    #
+    ops = [[index[qq] for qq in qubits] for qubits, _ in schedule["ops"]]
+
+    blocks = [shared_memory.SharedMemory(create=True, size=dim*dim*dtype.itemsize) for _ in range(2)]
+    report = {"workers": workers, "slabs": 4**nshards, "segments": 0, "reshards": 0, "allocations": 0,
+              "apply_time": 0.0, "move_time": 0.0}
+    ##-- the tensor starts without any qid, as the scalar 1
+    state = {"cur": 0, "active": [], "sharded": [], "layout": []}
+    np.ndarray((1,), dtype=dtype, buffer=blocks[0].buf)[0] = 1
+    shape_of = lambda layout: tuple(qid_shape[aa % nqids] for aa in layout)
+
+    try:
+        with multiprocessing.get_context().Pool(workers) as pool:
+            ##-- run a task on every slab of the destination, in the other block
+            def move(task, new_layout, nlead, arg):
+                dst_shape = shape_of(new_layout)
+                nslabs = int(np.prod(dst_shape[:nlead]))
+                start = time.perf_counter()
+                pool.starmap(task, [(blocks[state["cur"]].name, shape_of(state["layout"]), blocks[1 - state["cur"]].name,
+                                     dst_shape, dtype.str, nlead, arg, slabs) for slabs in _chunks(nslabs, workers)])
+                report["move_time"] += time.perf_counter() - start
+                state["cur"] = 1 - state["cur"]
+                state["layout"] = new_layout
+            #
+
+            ##-- add new qids in |0> at the end of the layout
+            def allocate(new):
+                move(_run_allocate, state["layout"] + new + [nqids + qq for qq in new], 2*len(state["sharded"]), len(new))
+                state["active"] += new
+                report["allocations"] += 1
+            #
+
+            ##-- transpose into the layout of new shards
+            def reshard(sharded):
+                new_layout = _layout(state["active"], sharded, nqids)
+                perm = [state["layout"].index(aa) for aa in new_layout]
+                state["sharded"] = list(sharded)
+                move(_run_transpose, new_layout, 2*len(sharded), perm)
+                report["reshards"] += 1
+            #
+
+            kk = 0
+            while kk < len(ops):
+                new = [qq for qq in ops[kk] if qq not in state["active"]]
+                if new:
+                    allocate(new)
+                #
+                ##-- shard the photons not needed for the longest time
+                candidates = [pp for pp in photons if pp in state["active"] and pp not in ops[kk]]
+                wanted = min(nshards, len(candidates))
+                if any(qq in state["sharded"] for qq in ops[kk]) or len(state["sharded"]) < wanted:
+                    reshard(_choose_shards(ops, kk, candidates, wanted))
+                #
+                end = kk + 1
+                while end < len(ops) and all(qq in state["active"] and qq not in state["sharded"] for qq in ops[end]):
+                    end += 1
+                #
+
+                nlead = 2*len(state["sharded"])
+                layout = state["layout"]
+                segment = [(kraus, [layout.index(qq) - nlead for qq in qs], [layout.index(nqids + qq) - nlead for qq in qs])
+                           for (_, kraus), qs in zip(schedule["ops"][kk:end], ops[kk:end])]
+                shape = shape_of(layout)
+                nslabs = int(np.prod(shape[:nlead]))
+                start = time.perf_counter()
+                pool.starmap(_run_segment, [(blocks[state["cur"]].name, shape, dtype.str, nlead, slabs, segment)
+                                            for slabs in _chunks(nslabs, workers)])
+                report["apply_time"] += time.perf_counter() - start
+                report["segments"] += 1
+                kk = end
+            #
+            ##-- qids never touched stay in |0>; back to the canonical layout
+            new = [qq for qq in range(nqids) if qq not in state["active"]]
+            if new:
+                allocate(new)
+            #
+            reshard([])
+        #
+        rho = np.array(np.ndarray((dim, dim), dtype=dtype, buffer=blocks[state["cur"]].buf))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+        #
+    #
+    return rho, qid_shape, report
+#
@@ -0,0 +1,272 @@
+###
+#   This module is a bit-packed binary format for sets of Pauli operators,
+#   e.g., the 2^N elements of the stabilizer group of a graph state, and a
+#   vectorized evaluator of their expectation values on a density matrix.
+#
+#   File layout: the magic bytes, the length of a json header (the name of
+#   the graph, number of qubits, of operators and of 64-bit words per
+#   operator), the header, the X bits and the Z bits of every operator as
+#   little-endian uint64 words (bit q % 64 of word q // 64 is qubit q; a Y
+#   has both bits set) and the packed sign bits (1 for a minus sign), each
+#   section aligned to 8 bytes so everything can be memory mapped.
+#
+#   The names_*_Nqubits.txt files of build_all_stabilizers_graph_state.ipynb
+#   (tab-separated coefficient and Pauli string, with 1 for the identity)
+#   are converted with convert_names_file.
+#
+#   usage: python -m state_gen_stuff.stabilizer_sets names_1D_cluster_8qubits.txt ...
+###
+
+### loading some moduels
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+###
+#   Format
+###
+MAGIC = b"Q3STAB01"
+
+##-- pad a section to a multiple of 8 bytes
+def _pad(nbytes):
+    return (-nbytes) % 8
+#
+
+##-- pack the bits of a (M, N) boolean array into (M, ceil(N/64)) uint64 words
+def pack_bits(bits):
+    bits = np.asarray(bits, dtype=bool)
+    nwords = -(-bits.shape[1] // 64)
+    padded = np.zeros((bits.shape[0], 64*nwords), dtype=bool)
+    padded[:, :bits.shape[1]] = bits
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8")
+#
+
+##-- the (M, N) boolean array of packed words
+def unpack_bits(words, nqubits):
+    words = np.ascontiguousarray(words, dtype="<u8")
+    return np.unpackbits(words.view(np.uint8), axis=1, bitorder="little")[:, :nqubits].astype(bool)
+#
+
+###
+#   Pauli sets
+###
+##-- the X bits, Z bits and sign bits of Pauli strings such as "-XZ1Y"
+def paulis_from_strings(strings, signs=None):
+    """
+    Returns the (M, N) X and Z bit arrays and the (M,) sign bits of the Pauli
+    strings; I or 1 is the identity. signs, if given, are the coefficients of
+    the strings (only their sign is kept).
+
+    """
+    chars = np.array([list(ss) for ss in strings])
+    xx = (chars == "X") | (chars == "Y")
+    zz = (chars == "Z") | (chars == "Y")
+    negative = np.zeros(len(strings), dtype=bool) if signs is None else np.asarray(signs, dtype=float) < 0
+    return xx, zz, negative
+#
+
+##-- the Pauli strings of X and Z bit arrays
+def paulis_to_strings(xx, zz, identity="I"):
+    chars = np.array([identity, "Z", "X", "Y"])[2*np.asarray(xx, dtype=int) + np.asarray(zz, dtype=int)]
+    return ["".join(row) for row in chars]
+#
+
+##-- every element of the stabilizer group of a graph state
+def graph_stabilizers(graph):
+    """
+    Returns the X bits, Z bits and sign bits of the 2^N products of the node
+    generators X_n Z_N(n) of graph (nodes 0..N-1), in the order of the names
+    files: element i is the product of the generators n with bit N-1-n of i
+    set. The product over a set S is (-1)^(e(S) + nY/2) times the Pauli
+    string, with e(S) the edges inside S and nY the number of Y's.
+
+    """
+    nn = len(graph)
+    adjacency = np.zeros((nn, nn), dtype=np.int64)
+    for aa, bb in graph.edges:
+        adjacency[aa, bb] = adjacency[bb, aa] = 1
+    #
+    subsets = (np.arange(2**nn)[:, None] >> (nn - 1 - np.arange(nn))) & 1
+    xx = subsets.astype(bool)
+    zz = (subsets @ adjacency) % 2 == 1
+    inner = ((subsets @ adjacency)*subsets).sum(axis=1)//2
+    ny = (xx & zz).sum(axis=1)
+    negative = (inner + ny//2) % 2 == 1
+    return xx, zz, negative
+#
+
+###
+#   Files
+###
+##-- encode a set of Pauli operators into bytes
+def encode(xx, zz, negative, graph=""):
+    xx = np.asarray(xx, dtype=bool)
+    nops, nqubits = xx.shape
+    xwords = pack_bits(xx)
+    zwords = pack_bits(zz)
+    sign_bytes = np.packbits(np.asarray(negative, dtype=bool), bitorder="little").tobytes()
+
+    header = json.dumps({
+        "graph": graph,
+        "nqubits": nqubits,
+        "n_ops": nops,
+        "nwords": xwords.shape[1],
+    }).encode()
+    header += b" "*_pad(len(MAGIC) + 4 + len(header))
+    return b"".join([
+        MAGIC, struct.pack("<I", len(header)), header,
+        xwords.tobytes(), zwords.tobytes(),
+        sign_bytes, b"\0"*_pad(len(sign_bytes)),
+    ])
+#
+
+##-- write a set of Pauli operators to a file
+def save(path, xx, zz, negative, graph=""):
+    with open(path, "wb") as ff:
+        ff.write(encode(xx, zz, negative, graph))
+    #
+#
+
+##-- memory map a stabilizer-set file
+def load(path):
+    """
+    Returns a dictionary with the header and the memory-mapped "x" and "z"
+    words, of shape (n_ops, nwords), and packed "signs" bytes of a file
+    written by save. Nothing is read until the arrays are used.
+
+    """
+    with open(path, "rb") as ff:
+        if ff.read(len(MAGIC)) != MAGIC:
+            raise ValueError("not a stabilizer-set file: %s" % path)
+        #
+        (hlen,) = struct.unpack("<I", ff.read(4))
+        header = json.loads(ff.read(hlen).decode())
+    #
+    shape = (header["n_ops"], header["nwords"])
+    offset = len(MAGIC) + 4 + hlen
+    wbytes = 8*shape[0]*shape[1]
+    return {
+        "header": header,
+        "x": np.memmap(path, dtype="<u8", mode="r", offset=offset, shape=shape),
+        "z": np.memmap(path, dtype="<u8", mode="r", offset=offset + wbytes, shape=shape),
+        "signs": np.memmap(path, dtype=np.uint8, mode="r", offset=offset + 2*wbytes, shape=(-(-shape[0] // 8),)),
+    }
+#
+
+##-- the sign (+1 or -1) of every operator of a loaded set
+def stabilizer_signs(stabs):
+    bits = np.unpackbits(np.asarray(stabs["signs"]), bitorder="little")[:stabs["header"]["n_ops"]]
+    return 1 - 2*bits.astype(np.int64)
+#
+
+##-- the X and Z bits of a loaded set
+def stabilizer_bits(stabs):
+    nqubits = stabs["header"]["nqubits"]
+    return unpack_bits(stabs["x"], nqubits), unpack_bits(stabs["z"], nqubits)
+#
+
+###
+#   Conversion of the text files
+###
+##-- read a names_*_Nqubits.txt file
+def read_names_file(path):
+    coefs = []
+    strings = []
+    with open(path) as ff:
+        for line in ff:
+            if line.strip():
+                coef, string = line.split()[:2]
+                coefs.append(float(coef))
+                strings.append(string)
+            #
+        #
+    #
+    return paulis_from_strings(strings, coefs)
+#
+
+##-- convert a names_*_Nqubits.txt file into the binary format
+def convert_names_file(path, out_path=None, graph=None):
+    """
+    Writes the stabilizers of the text file into out_path (by default the same
+    name with the .stab extension) and returns out_path. The graph name
+    defaults to the file name without the names_ prefix, e.g. 1D_cluster_8qubits.
+
+    """
+    base = os.path.splitext(os.path.basename(path))[0]
+    if graph is None:
+        graph = base[len("names_"):] if base.startswith("names_") else base
+    #
+    if out_path is None:
+        out_path = os.path.splitext(path)[0] + ".stab"
+    #
+    save(out_path, *read_names_file(path), graph=graph)
+    return out_path
+#
+
+###
+#   Evaluation
+###
+##-- parity of the bits of an integer array
+def _parity(values):
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        values ^= values >> shift
+    #
+    return values & 1
+#
+
+##-- expectation values of every operator of a set on a density matrix
+def stabilizer_expectation_values(rho, stabs, chunk=64):
+    """
+    Returns the signed expectation values Tr(P rho) of the operators of a
+    loaded set (see load) on the density matrix rho of its qubits (big-endian
+    order, e.g., from witness_sampling.register_state). With the Pauli string
+    i^nY X^x Z^z, Tr(X^x Z^z rho) = sum_b (-1)^(z.(b^x)) rho[b^x, b], so each
+    operator costs one gather of 2^N elements, done chunk operators at a time.
+
+    """
+    nqubits = stabs["header"]["nqubits"]
+    xx, zz = stabilizer_bits(stabs)
+    signs = stabilizer_signs(stabs)
+    weights = np.int64(1) << (nqubits - 1 - np.arange(nqubits, dtype=np.int64))
+    xmasks = xx.astype(np.int64) @ weights
+    zmasks = zz.astype(np.int64) @ weights
+    phases = (1j)**((xx & zz).sum(axis=1))
+
+    rho = np.asarray(rho)
+    basis = np.arange(2**nqubits, dtype=np.int64)
+    values = np.empty(len(signs))
+    for start in range(0, len(signs), chunk):
+        xm = xmasks[start:start + chunk, None]
+        zm = zmasks[start:start + chunk, None]
+        rows = basis[None, :] ^ xm
+        terms = (1 - 2*_parity(zm & rows))*rho[rows, basis[None, :]]
+        values[start:start + chunk] = (phases[start:start + chunk]*terms.sum(axis=1)).real
+    #
+    return signs*values
+#
+
+###
+#   Command line entry point
+###
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert names_*_Nqubits.txt stabilizer files to the binary format.")
+    parser.add_argument("files", nargs="+", help="text files to convert")
+    parser.add_argument("-o", "--outdir", default=None, help="folder for the .stab files (default: next to each file)")
+    args = parser.parse_args(argv)
+
+    for path in args.files:
+        out_path = None
+        if args.outdir is not None:
+            os.makedirs(args.outdir, exist_ok=True)
+            out_path = os.path.join(args.outdir, os.path.splitext(os.path.basename(path))[0] + ".stab")
+        #
+        print(convert_names_file(path, out_path))
+    #
+#
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+###
+#   This module runs a generation circuit as a stream: a generator that yields
+#   an observation after every emitted photon (the last operation acting on
+#   it, its CNOT or SWAP), with the populations of the storage levels (the |f>
+#   population is the leakage), the purity of the simulated state, and the
+#   requested marginals and stabilizer values of the photons emitted so far.
+#
+#   Once a photon is emitted its reduced state (and that of any set of emitted
+#   photons) does not change anymore, so each requested quantity is evaluated
+#   once, as soon as its support is emitted, and the photons no longer needed
+#   are traced out. A consumer can stop a bad parameter point early by
+#   breaking out of the loop.
+###
+
+### loading some moduels
+import numpy as np
+
+from . import lightcone
+from . import witness_sampling
+
+###
+#   Reduced states of a density tensor
+###
+##-- reduced density matrix of the qids at some positions of a density tensor
+def reduced_state(tensor, positions, nqids):
+    others = [ii for ii in range(nqids) if ii not in positions]
+    perm = list(positions) + others
+    tensor = tensor.transpose(perm + [nqids + ii for ii in perm])
+    dim = int(np.prod(tensor.shape[:len(positions)]))
+    rest = int(np.prod(tensor.shape[len(positions):nqids]))
+    return np.trace(tensor.reshape(dim, rest, dim, rest), axis1=1, axis2=3)
+#
+
+###
+#   Streaming simulation
+###
+##-- simulate a circuit, yielding an observation after every emission
+def stream_emissions(circuit, paulis=(), marginals=(), keep_all=False):
+    """
+    Generator over the emissions of the circuit. paulis is a list of
+    {node: Pauli} dictionaries (see witness_sampling.node_paulis) and
+    marginals a list of tuples of nodes; node k is the k-th photon in sorted
+    order. Each observation is a dictionary with
+
+        step          the number of photons emitted so far
+        photon        the node emitted at this step
+        emitted       the nodes emitted so far, in emission order
+        populations   array (storages, 3) with the populations of |g>, |e>, |f>
+        leakage       the |f> population of each storage
+        purity        Tr(rho^2) of the simulated state
+        stabilizers   {tag: value} of the Pauli operators whose support is emitted
+        marginals     {support: rho} of the marginals whose support is emitted
+        new           the tags and supports completed at this step
+
+    The simulated state holds the storages and the emitted photons still
+    needed by a pending quantity; with keep_all every emitted photon is kept,
+    so the purity is that of the whole register.
+
+    """
+    schedule = lightcone.circuit_schedule(circuit)
+    storages = [qq for qq in schedule["qids"] if qq.dimension != 2]
+    photons = [qq for qq in schedule["qids"] if qq.dimension == 2]
+    node_of = {qq: nn for nn, qq in enumerate(photons)}
+
+    pending_paulis = [(witness_sampling.pauli_tag(pp), pp) for pp in paulis]
+    pending_marginals = [tuple(sorted(mm)) for mm in marginals]
+    stabilizers = {}
+    states = {}
+    emitted = []
+
+    dtype = np.result_type(np.complex64, *[kraus.dtype for _, kraus in schedule["ops"]])
+    tensor = np.ones((), dtype=dtype)
+    active = []
+    for qq in storages:
+        tensor = lightcone.allocate_qid(tensor, len(active), qq.dimension)
+        active.append(qq)
+    #
+
+    for kk, (qubits, kraus) in enumerate(schedule["ops"]):
+        for qq in qubits:
+            if qq not in active:
+                tensor = lightcone.allocate_qid(tensor, len(active), qq.dimension)
+                active.append(qq)
+            #
+        #
+        tensor = lightcone.apply_kraus(tensor, kraus, [active.index(qq) for qq in qubits], len(active))
+
+        done = [qq for qq in qubits if qq.dimension == 2 and schedule["last"][qq] == kk]
+        if not done:
+            continue
+        #
+        for qq in done:
+            new = []
+            emitted.append(node_of[qq])
+            ready = set(emitted)
+
+            ##-- evaluate the quantities whose support is now emitted
+            for tag, pauli in list(pending_paulis):
+                if set(pauli) <= ready:
+                    support = sorted(pauli)
+                    rho = reduced_state(tensor, [active.index(photons[nn]) for nn in support], len(active))
+                    op = witness_sampling.pauli_operator("".join(pauli[nn] for nn in support))
+                    stabilizers[tag] = float(np.trace(rho @ op).real)
+                    pending_paulis.remove((tag, pauli))
+                    new.append(tag)
+                #
+            #
+            for support in list(pending_marginals):
+                if set(support) <= ready:
+                    states[support] = reduced_state(tensor, [active.index(photons[nn]) for nn in support], len(active))
+                    pending_marginals.remove(support)
+                    new.append(support)
+                #
+            #
+
+            populations = np.array([np.diagonal(reduced_state(tensor, [active.index(ss)], len(active))).real
+                                    for ss in storages])
+            observation = {
+                "step": len(emitted),
+                "photon": node_of[qq],
+                "emitted": list(emitted),
+                "populations": populations,
+                "leakage": populations[:, 2],
+                "purity": float(np.vdot(tensor, tensor).real),
+                "stabilizers": dict(stabilizers),
+                "marginals": dict(states),
+                "new": new,
+            }
+
+            ##-- trace out the emitted photons no pending quantity needs
+            if not keep_all:
+                needed = set(nn for _, pp in pending_paulis for nn in pp) | set(nn for mm in pending_marginals for nn in mm)
+                for pp in [pp for pp in active if pp.dimension == 2 and pp in node_of
+                           and node_of[pp] in ready and node_of[pp] not in needed]:
+                    tensor = lightcone.trace_qid(tensor, active.index(pp), len(active))
+                    active.remove(pp)
+                #
+            #
+            yield observation
+        #
+    #
+#
+
+##-- consume the stream, stopping when a condition on an observation holds
+def run_until(stream, stop):
+    """
+    Returns the list of observations of stream up to (and including) the
+    first one for which stop(observation) is true, e.g.,
+    run_until(stream_emissions(circuit), lambda obs: obs["leakage"].max() > 0.05).
+
+    """
+    observations = []
+    for observation in stream:
+        observations.append(observation)
+        if stop(observation):
+            break
+        #
+    #
+    return observations
+#
@@ -0,0 +1,82 @@
+###
+#   This module builds the target graphs of the graph states prepared with the
+#   circuits in graph_state_gen_circuits.py. Node n of each graph is the n-th
+#   qubit of the register, in the order of the LineQubit indices.
+###
+
+### loading some moduels
+import networkx as nx
+
+###
+#   Graph builders
+###
+##-- the path graph of the 1D cluster state
+def build_1D_cluster_state_graph(num_qubits):
+    return nx.path_graph(num_qubits)
+#
+
+##-- the graph of the 2D cluster state with num_storages rows
+def build_2D_cluster_state_graph(num_qubits, num_storages):
+    """
+    Returns the graph of a num_storages by num_qubits/num_storages grid, with
+    the qubits of the different rows interleaved in the register as done in
+    noisy_cluster_state_2D and noisy_cluster_state_2D_3S.
+
+    """
+    qubit_graph = nx.Graph()
+    qubit_graph.add_nodes_from(range(num_qubits))
+
+    for nn in range(num_qubits):
+        #- qubits emitted by neighbouring storages
+        if nn % num_storages != num_storages - 1:
+            qubit_graph.add_edge(nn, nn + 1)
+        #
+        #- consecutive qubits emitted by the same storage
+        if nn + num_storages < num_qubits:
+            qubit_graph.add_edge(nn, nn + num_storages)
+        #
+    #
+    return qubit_graph
+#
+
+##-- the graph of the ring cluster state
+def build_ring_graph(num_qubits):
+    qubit_graph = nx.Graph()
+    qubit_graph.add_nodes_from(range(num_qubits))
+    nodes = list(range(num_qubits))
+
+    evens = nodes[::2]
+    odds = nodes[1::2]
+
+    for ii in range(len(evens)-1):
+        qubit_graph.add_edge(evens[ii], evens[ii+1])
+    #
+    for ii in range(len(odds)-1):
+        qubit_graph.add_edge(odds[ii], odds[ii+1])
+    #
+    qubit_graph.add_edge(evens[0], odds[0])
+    qubit_graph.add_edge(evens[-1], odds[-1])
+
+    return qubit_graph
+#
+
+##-- the graph of the tree graph state
+def build_tree_graph(nbranches):
+    num_qubits = 3*nbranches + 1
+
+    qubit_graph = nx.Graph()
+    qubit_graph.add_nodes_from(range(num_qubits))
+    nodes = list(range(num_qubits))
+
+    #- add the edges incident on the root
+    for ii in range(nbranches):
+        qubit_graph.add_edge(nodes[0], nodes[-2 - ii*3])
+    #
+
+    for ii in range(nbranches, 0, -1):
+        qubit_graph.add_edge(nodes[3*ii - 2], nodes[3*ii - 1])
+        qubit_graph.add_edge(nodes[3*ii - 1], nodes[3*ii])
+    #
+
+    return qubit_graph
+#
@@ -0,0 +1,228 @@
+###
+#   This module evaluates the stabilizer expectation values and the witness of
+#   the repeated-step protocols of graph_state_gen_circuits.py (the 1D chain,
+#   the ladder and the ring) with transfer matrices on the storage space.
+#
+#   Every emission step is a channel from the storages to the storages and the
+#   photons it emits. Contracting the emitted photons with a Pauli operator (or
+#   the identity) gives a transfer matrix acting on the vectorized density
+#   matrix of the storages, of size 9^s x 9^s for s storages. A local
+#   stabilizer is then a product of a few Pauli transfer matrices between a
+#   prefix state and a suffix covector, and all the node and edge terms of a
+#   graph with N photons cost O(N) matrix-vector products.
+###
+
+### loading some moduels
+import numpy as np
+
+import cirq
+
+from . import graph_state_gen_circuits as gsg
+from . import lightcone
+from . import target_graphs
+from . import witness_sampling
+
+###
+#   Step channels
+###
+##-- the channel of one emission step, from the storages to storages (x) photons
+def step_channel(build_step, nstorages, nphotons):
+    """
+    Builds one step with build_step(circuit, storages, photons) and returns
+    the image of every storage basis element |a><b| (with the photons in |0>)
+    as a tensor of shape (9^s, 3,..,3, 2,..,2, 3,..,3, 2,..,2), where the first
+    index is a*3^s + b.
+
+    """
+    storages = cirq.LineQid.range(0, nstorages, dimension=3)
+    photons = cirq.LineQubit.range(nstorages, nstorages + nphotons)
+    qids = [*storages, *photons]
+    index = {qq: ii for ii, qq in enumerate(qids)}
+
+    circuit = cirq.Circuit()
+    build_step(circuit, storages, photons)
+    schedule = lightcone.circuit_schedule(circuit)
+
+    ds = 3**nstorages
+    dp = 2**nphotons
+    rho = np.zeros((ds*ds, ds*dp, ds*dp), dtype=complex)
+    for aa in range(ds):
+        for bb in range(ds):
+            rho[aa*ds + bb, aa*dp, bb*dp] = 1
+        #
+    #
+    shape = tuple(qq.dimension for qq in qids)
+    tensor = rho.reshape((ds*ds,) + shape + shape)
+    for qubits, kraus in schedule["ops"]:
+        tensor = lightcone.apply_kraus(tensor, kraus, [index[qq] for qq in qubits], len(qids), nbatch=1)
+    #
+    return tensor
+#
+
+##-- transfer matrix of a step with the emitted photons contracted with Paulis
+def transfer_matrix(channel, nstorages, paulis):
+    """
+    Returns the matrix T with vec(Tr_photons[(I (x) P) step(rho)]) =
+    T vec(rho), for the row-major vectorization of the storage density
+    matrix, where P is the tensor product of the Paulis in paulis (a string
+    with one of I, X, Y, Z per photon of the step).
+
+    """
+    nphotons = len(paulis)
+    ds = 3**nstorages
+    tensor = channel
+    ##-- contract the photons from the last one, so the axes of the earlier ones do not move
+    for kk in range(nphotons - 1, -1, -1):
+        ket = 1 + nstorages + kk
+        bra = ket + nstorages + kk + 1
+        tensor = np.einsum(tensor, list(range(tensor.ndim)), witness_sampling.PAULI_MATRICES[paulis[kk]], [bra, ket],
+                           [ii for ii in range(tensor.ndim) if ii not in (ket, bra)])
+    #
+    return tensor.reshape(ds*ds, ds*ds).T
+#
+
+###
+#   Repeated-step protocols
+###
+##-- the steps of each topology, as (kind, nodes emitted by the step) in emission order
+def protocol_steps(topology, nqubits):
+    if topology == "1D":
+        return [("step", (ii - 1,)) for ii in range(nqubits, 1, -1)] + [("last", (0,))]
+    #
+    if topology == "2D":
+        if nqubits % 2:
+            raise ValueError("the ladder needs an even number of qubits")
+        #
+        return [("step", (2*ii, 2*ii + 1)) for ii in range(nqubits//2 - 1, 0, -1)] + [("last", (0, 1))]
+    #
+    if topology == "ring":
+        first = ("first", (nqubits - 1,)) if nqubits % 2 else ("first", ())
+        return [first] + [("step", (2*ii, 2*ii + 1)) for ii in range(nqubits//2 - 1, 0, -1)] + [("last", (0, 1))]
+    #
+    raise ValueError("no transfer-matrix protocol for topology %s" % topology)
+#
+
+##-- the number of storages and the step builders of each topology
+def protocol_builders(topology, nqubits, wait_ts, coherence_times, noise_params):
+    """
+    Returns the number of storages and a dictionary mapping the kind of each
+    step to build_step(circuit, storages, photons), using the step functions
+    of the noisy builders in graph_state_gen_circuits.py.
+
+    """
+    if topology == "1D":
+        (ctimes_s1,) = coherence_times
+        return 1, {
+            "step": lambda cc, ss, pp: gsg.noisy_cluster_state_1D_step(cc, ss[0], pp[0], wait_ts, ctimes_s1, noise_params),
+            "last": lambda cc, ss, pp: gsg.noisy_cluster_state_1D_last_step(cc, ss[0], pp[0], wait_ts, ctimes_s1, noise_params),
+        }
+    #
+    ctimes_s1, ctimes_s2 = coherence_times
+    if topology == "2D":
+        return 2, {
+            "step": lambda cc, ss, pp: gsg.noisy_cluster_state_2D_step(cc, ss, *pp, wait_ts, ctimes_s1, ctimes_s2, noise_params),
+            "last": lambda cc, ss, pp: gsg.noisy_cluster_state_2D_last_step(cc, ss, *pp, wait_ts, ctimes_s1, ctimes_s2, noise_params),
+        }
+    #
+    if topology == "ring":
+        return 2, {
+            "first": lambda cc, ss, pp: gsg.noisy_ring_cluster_state_first_step(cc, ss, pp[0] if pp else None,
+                                                                                wait_ts, ctimes_s1, ctimes_s2, noise_params),
+            "step": lambda cc, ss, pp: gsg.noisy_ring_cluster_state_step(cc, ss, *pp, wait_ts, ctimes_s1, ctimes_s2, noise_params),
+            "last": lambda cc, ss, pp: gsg.noisy_ring_cluster_state_last_step(cc, ss, *pp, wait_ts, ctimes_s1, ctimes_s2, noise_params),
+        }
+    #
+    raise ValueError("no transfer-matrix protocol for topology %s" % topology)
+#
+
+##-- the target graph of each topology
+TARGET_GRAPHS = {
+    "1D": target_graphs.build_1D_cluster_state_graph,
+    "2D": lambda nn: target_graphs.build_2D_cluster_state_graph(nn, 2),
+    "ring": target_graphs.build_ring_graph,
+}
+
+###
+#   Evaluation
+###
+##-- expectation values of local Pauli operators in O(N)
+def transfer_expectation_values(topology, nqubits, wait_ts, coherence_times, noise_params, paulis):
+    """
+    Returns the expectation values of the Pauli operators in paulis, each one
+    a {node: Pauli} dictionary (see witness_sampling.node_paulis), on the
+    photons of the state prepared by the noisy builder of the topology ("1D",
+    "2D" for the ladder, or "ring") with nqubits photons.
+
+    Only the step channels of the protocol are simulated. The prefix states of
+    the storages and the suffix covectors are computed once, so each operator
+    costs one matrix-vector product per step it spans.
+
+    """
+    nstorages, builders = protocol_builders(topology, nqubits, wait_ts, coherence_times, noise_params)
+    steps = protocol_steps(topology, nqubits)
+    ds = 3**nstorages
+
+    channels = {}
+    matrices = {}
+    def matrix(kind, nodes, pauli):
+        key = (kind, "".join(pauli.get(nn, "I") for nn in nodes))
+        if key not in matrices:
+            if kind not in channels:
+                channels[kind] = step_channel(builders[kind], nstorages, len(nodes))
+            #
+            matrices[key] = transfer_matrix(channels[kind], nstorages, key[1])
+        #
+        return matrices[key]
+    #
+
+    ##-- prefix states and suffix covectors of the storages
+    nsteps = len(steps)
+    prefix = np.zeros((nsteps + 1, ds*ds), dtype=complex)
+    prefix[0, 0] = 1
+    for kk, (kind, nodes) in enumerate(steps):
+        prefix[kk + 1] = matrix(kind, nodes, {}) @ prefix[kk]
+    #
+    suffix = np.zeros((nsteps + 1, ds*ds), dtype=complex)
+    suffix[nsteps] = np.eye(ds).reshape(-1)
+    for kk in range(nsteps - 1, -1, -1):
+        kind, nodes = steps[kk]
+        suffix[kk] = suffix[kk + 1] @ matrix(kind, nodes, {})
+    #
+
+    ##-- the step emitting each node
+    step_of = {}
+    for kk, (kind, nodes) in enumerate(steps):
+        for nn in nodes:
+            step_of[nn] = kk
+        #
+    #
+
+    values = np.zeros(len(paulis))
+    for ii, pauli in enumerate(paulis):
+        support = [step_of[nn] for nn in pauli]
+        first, last = min(support), max(support)
+        vec = prefix[first]
+        for kk in range(first, last + 1):
+            vec = matrix(steps[kk][0], steps[kk][1], pauli) @ vec
+        #
+        values[ii] = (suffix[last + 1] @ vec).real
+    #
+    return values
+#
+
+##-- the witness of a repeated-step protocol in O(N)
+def transfer_witness(topology, nqubits, wait_ts, coherence_times, noise_params,
+                     witness=witness_sampling.toth_guhne_witness):
+    """
+    Returns the node generators and edge products of the target graph in the
+    notebook format ({"tag": [...], "value": [...]}) and the witness, for the
+    state prepared by the noisy builder of the topology with nqubits photons,
+    evaluated with transfer_expectation_values.
+
+    """
+    graph = TARGET_GRAPHS[topology](nqubits)
+    nodes = witness_sampling.node_paulis(graph)
+    edges = witness_sampling.edge_paulis(graph)
+    values = transfer_expectation_values(topology, nqubits, wait_ts, coherence_times, noise_params, nodes + edges)
+    return witness_sampling.witness_result(nodes, edges, values[:len(nodes)], values[len(nodes):], witness)
+#
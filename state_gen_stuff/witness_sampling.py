@@ -0,0 +1,315 @@
+###
+#   This module samples finite-shot measurement outcomes of the Pauli settings
+#   needed to evaluate the entanglement witness on the simulated graph states.
+###
+
+### loading some moduels
+import numpy as np
+
+###
+#   Register state and Pauli strings
+###
+##-- single-qubit Pauli matrices
+PAULI_MATRICES = {
+    "I": np.eye(2, dtype=complex),
+    "X": np.array([[0, 1], [1, 0]], dtype=complex),
+    "Y": np.array([[0, -1j], [1j, 0]], dtype=complex),
+    "Z": np.array([[1, 0], [0, -1]], dtype=complex),
+}
+
+##-- local basis changes mapping each Pauli onto Z
+_ROTATIONS = {
+    "I": np.eye(2, dtype=complex),
+    "Z": np.eye(2, dtype=complex),
+    "X": np.array([[1, 1], [1, -1]], dtype=complex)/np.sqrt(2),
+    "Y": np.array([[1, -1j], [1, 1j]], dtype=complex)/np.sqrt(2),
+}
+
+##-- reduced state of the qubit register
+def register_state(rho, qid_shape):
+    """
+    Returns the density matrix of the qubits in qid_shape, tracing out
+    every qid of dimension different from 2 (i.e., the qutrit storages).
+    rho can be a density matrix or a state vector.
+
+    """
+    qid_shape = tuple(qid_shape)
+    nqids = len(qid_shape)
+    keep = [ii for ii in range(nqids) if qid_shape[ii] == 2]
+    trace = [ii for ii in range(nqids) if qid_shape[ii] != 2]
+    dim = 2**len(keep)
+
+    rho = np.asarray(rho)
+    if rho.ndim == 1:
+        psi = rho.reshape(qid_shape).transpose(trace + keep).reshape(-1, dim)
+        return psi.T @ psi.conj()
+    #
+    ##-- integer subscripts, the bra of a storage repeats its ket
+    tensor = rho.reshape(qid_shape + qid_shape)
+    bra = [nqids + ii if qid_shape[ii] == 2 else ii for ii in range(nqids)]
+    out = keep + [bra[ii] for ii in keep]
+    reduced = np.einsum(tensor, list(range(nqids)) + bra, out)
+    return reduced.reshape(dim, dim)
+#
+
+##-- the tag used in the notebooks for a Pauli string (or {node: Pauli} dictionary), e.g. Z0X1Z2
+def pauli_tag(pauli):
+    if isinstance(pauli, dict):
+        return "".join(pauli[ii] + str(ii) for ii in sorted(pauli) if pauli[ii] != "I")
+    #
+    return "".join(pp + str(ii) for ii, pp in enumerate(pauli) if pp != "I")
+#
+
+##-- the matrix of a Pauli string
+def pauli_operator(pauli):
+    op = np.ones((1, 1), dtype=complex)
+    for pp in pauli:
+        op = np.kron(op, PAULI_MATRICES[pp])
+    #
+    return op
+#
+
+##-- node generators of a graph state as {node: Pauli} dictionaries
+def node_paulis(graph):
+    """
+    Returns a list with the stabilizer generators X_n Z_{N(n)}, one per node
+    of the graph, each one as a dictionary mapping the nodes of its support
+    to X or Z. The nodes are labelled 0..N-1.
+
+    """
+    paulis = []
+    for nn in sorted(graph.nodes()):
+        pauli = {ne: "Z" for ne in graph.neighbors(nn)}
+        pauli[nn] = "X"
+        paulis.append(pauli)
+    #
+    return paulis
+#
+
+##-- products of generators on the edges of a graph state as {node: Pauli} dictionaries
+def edge_paulis(graph):
+    """
+    Returns a list with the products g_a g_b of the generators on every edge
+    (a, b) of the graph, i.e., Y_a Y_b times Z on the symmetric difference of
+    the neighbourhoods, each one as a dictionary mapping the nodes of its
+    support to Y or Z.
+
+    """
+    paulis = []
+    for aa, bb in graph.edges():
+        zs = set(graph.neighbors(aa)) ^ set(graph.neighbors(bb))
+        pauli = {zz: "Z" for zz in zs - {aa, bb}}
+        pauli[aa] = "Y"
+        pauli[bb] = "Y"
+        paulis.append(pauli)
+    #
+    return paulis
+#
+
+##-- full-register Pauli string of a {node: Pauli} dictionary
+def pauli_string(pauli, nqubits):
+    return "".join(pauli.get(qq, "I") for qq in range(nqubits))
+#
+
+##-- node generators of a graph state as full-register Pauli strings
+def node_pauli_strings(graph):
+    """
+    Returns a list with the Pauli strings X_n Z_{N(n)} of the stabilizer
+    generators, one per node of the graph. The nodes are labelled 0..N-1.
+
+    """
+    return [pauli_string(pp, graph.number_of_nodes()) for pp in node_paulis(graph)]
+#
+
+##-- products of generators on the edges of a graph state
+def edge_pauli_strings(graph):
+    """
+    Returns a list with the Pauli strings of the products g_a g_b of the
+    generators on every edge (a, b) of the graph, i.e., Y_a Y_b times Z on the
+    symmetric difference of the neighbourhoods.
+
+    """
+    return [pauli_string(pp, graph.number_of_nodes()) for pp in edge_paulis(graph)]
+#
+
+###
+#   Measurement settings
+###
+##-- outcome probabilities of the register measured in a given setting
+def rotated_diagonal(rho, setting):
+    """
+    Returns the probabilities of the 2^N outcomes obtained when measuring every
+    qubit of the register in the local basis given by setting, a string of
+    X, Y, Z or I (I is measured in Z). rho can be a density matrix or a state
+    vector of the qubit register.
+
+    """
+    nqubits = len(setting)
+    rho = np.asarray(rho)
+    pure = rho.ndim == 1
+    tensor = rho.reshape((2,)*(nqubits if pure else 2*nqubits))
+
+    for qq, pp in enumerate(setting):
+        if pp in "IZ":
+            continue
+        #
+        uu = _ROTATIONS[pp]
+        tensor = np.moveaxis(np.tensordot(uu, tensor, axes=([1], [qq])), 0, qq)
+        if not pure:
+            tensor = np.moveaxis(np.tensordot(uu.conj(), tensor, axes=([1], [nqubits + qq])), 0, nqubits + qq)
+        #
+    #
+    if pure:
+        probs = np.abs(tensor.reshape(-1))**2
+    else:
+        probs = np.diagonal(tensor.reshape(2**nqubits, 2**nqubits)).real
+    #
+    probs = np.clip(probs, 0.0, None)
+    return probs/probs.sum()
+#
+
+##-- whether a Pauli string can be read from the outcomes of a setting (I is measured in Z)
+def measured_in(pauli, setting):
+    return len(pauli) == len(setting) and all(pp == "I" or pp == ss.replace("I", "Z") for pp, ss in zip(pauli, setting))
+#
+
+##-- the +1/-1 eigenvalue of a Pauli string on each outcome of its setting
+def parity_signs(pauli):
+    nqubits = len(pauli)
+    mask = 0
+    for qq, pp in enumerate(pauli):
+        if pp != "I":
+            mask |= 1 << (nqubits - 1 - qq)
+        #
+    #
+    outcomes = np.arange(2**nqubits, dtype=np.int64) & mask
+    parity = np.zeros(2**nqubits, dtype=np.int64)
+    while mask:
+        parity ^= outcomes & 1
+        outcomes >>= 1
+        mask >>= 1
+    #
+    return 1 - 2*parity
+#
+
+###
+#   Finite-shot sampling
+###
+##-- draw the outcome counts of a setting with a single multinomial draw
+def sample_counts(probs, shots, rng):
+    return rng.multinomial(shots, probs)
+#
+
+##-- estimate of Pauli expectation values from outcome counts
+def estimate_from_counts(counts, paulis):
+    """
+    Returns the estimates of the expectation values of the Pauli strings in
+    paulis from the outcome counts of a common setting. counts can carry
+    leading batch dimensions, e.g., bootstrap resamples.
+
+    """
+    counts = np.asarray(counts)
+    signs = np.stack([parity_signs(pp) for pp in paulis], axis=-1)
+    return (counts @ signs)/counts.sum(axis=-1, keepdims=True)
+#
+
+##-- exact expectation values of Pauli strings on the register state
+def expectation_values(rho, paulis):
+    return np.array([estimate_from_counts(rotated_diagonal(rho, pp), [pp])[0] for pp in paulis])
+#
+
+##-- the Toth-Guhne stabilizer witness, W = (N-1) - sum_n <g_n>
+def toth_guhne_witness(node_values, edge_values):
+    """
+    Returns the expectation value of the stabilizer witness built from the
+    node generators only; a negative value detects genuine multipartite
+    entanglement. The edge values are ignored. Any function with the same
+    signature can be passed to sample_witness.
+
+    """
+    node_values = np.asarray(node_values)
+    return (node_values.shape[-1] - 1) - node_values.sum(axis=-1)
+#
+
+##-- the node and edge values and the witness in the notebook format
+def witness_result(nodes, edges, node_values, edge_values, witness=toth_guhne_witness):
+    """
+    Returns {"nodes": {"tag": [...], "value": [...]}, "edges": {...},
+    "witness": ...} for the node generators and edge products nodes and edges
+    (Pauli strings or {node: Pauli} dictionaries) and their values. witness
+    is any function of the node and edge values, e.g., toth_guhne_witness.
+
+    """
+    node_values = np.asarray(node_values, dtype=float)
+    edge_values = np.asarray(edge_values, dtype=float)
+    return {
+        "nodes": {"tag": [pauli_tag(pp) for pp in nodes], "value": node_values.tolist()},
+        "edges": {"tag": [pauli_tag(pp) for pp in edges], "value": edge_values.tolist()},
+        "witness": float(witness(node_values, edge_values)),
+    }
+#
+
+##-- sample the witness and its bootstrap confidence interval
+def sample_witness(rho, graph, shots, qid_shape=None, witness=toth_guhne_witness,
+                   n_boot=1000, confidence=0.95, seed=None, settings=None):
+    """
+    Samples shots outcomes in each of the settings needed to evaluate the node
+    generators and edge products of the graph state, and estimates the witness
+    together with a percentile bootstrap confidence interval.
+
+    rho is the simulated state (density matrix or state vector). If qid_shape
+    is given, every qid of dimension different from 2 is traced out first.
+    settings gives the setting in which each node generator, then each edge
+    product, is measured (e.g., measurement_groups.pauli_settings); by
+    default each Pauli string is its own setting.
+
+    Returns a dictionary with the node and edge estimates in the notebook
+    format ({"tag": [...], "value": [...]}), the witness, its confidence
+    interval and the raw counts of each setting.
+
+    """
+    rng = np.random.default_rng(seed)
+    if qid_shape is not None:
+        rho = register_state(rho, qid_shape)
+    #
+
+    nodes = node_pauli_strings(graph)
+    edges = edge_pauli_strings(graph)
+    paulis = nodes + edges
+    settings = paulis if settings is None else list(settings)
+    if len(settings) != len(paulis):
+        raise ValueError("expected %d settings, got %d" % (len(paulis), len(settings)))
+    #
+    for pp, ss in zip(paulis, settings):
+        if not measured_in(pp, ss):
+            raise ValueError("the Pauli string %s cannot be measured in the setting %s" % (pp, ss))
+        #
+    #
+
+    ##-- one single multinomial draw per setting
+    counts = {}
+    values = np.zeros(len(paulis))
+    boots = np.zeros((n_boot, len(paulis)))
+    for kk, pp in enumerate(paulis):
+        if settings[kk] not in counts:
+            counts[settings[kk]] = sample_counts(rotated_diagonal(rho, settings[kk]), shots, rng)
+        #
+        values[kk] = estimate_from_counts(counts[settings[kk]], [pp])[0]
+    #
+
+    ##-- bootstrap the counts of every setting
+    for ss, cc in counts.items():
+        resamples = rng.multinomial(shots, cc/shots, size=n_boot)
+        members = [kk for kk in range(len(paulis)) if settings[kk] == ss]
+        boots[:, members] = estimate_from_counts(resamples, [paulis[kk] for kk in members])
+    #
+
+    nnodes = len(nodes)
+    wboots = witness(boots[:, :nnodes], boots[:, nnodes:])
+    alpha = 0.5*(1 - confidence)
+
+    result = witness_result(nodes, edges, values[:nnodes], values[nnodes:], witness)
+    result["witness_ci"] = (float(np.quantile(wboots, alpha)), float(np.quantile(wboots, 1 - alpha)))
+    result["counts"] = counts
+    return result
+#